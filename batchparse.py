@@ -0,0 +1,65 @@
+'''Parses a whole archive of crossnumber PDFs without opening a window.
+
+    python batchparse.py puzzles/ -o index.json
+    python batchparse.py 1-250 --folder puzzles -o index.json'''
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import re
+
+import puzzlecache
+
+def find_files(source, folder='.'):
+    '''PDF paths from a directory or from a numeric range such as 10-20'''
+    match = re.fullmatch('([0-9]+)(?:-([0-9]+))?', source)
+    if match:
+        first = int(match[1])
+        last = int(match[2] or first)
+        return [os.path.join(folder, f'crossnumber{number}.pdf')
+                for number in range(first, last + 1)]
+    return sorted(os.path.join(source, name) for name in os.listdir(source)
+            if re.fullmatch('crossnumber[0-9]+\\.pdf', name))
+
+def parse_file(filename):
+    '''Returns (filename, data, error) with anything the parser printed
+    folded into the error message'''
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            data = puzzlecache.load(filename)
+    except Exception as e:
+        message = ' '.join(output.getvalue().split() + [type(e).__name__, str(e)])
+        return filename, None, message.strip()
+    return filename, data, None
+
+def parse_all(filenames, workers=None):
+    puzzles = {}
+    errors = {}
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        for filename, data, error in pool.map(parse_file, filenames, chunksize=4):
+            if error is None:
+                puzzles[filename] = data
+            else:
+                errors[filename] = error
+    return {'puzzles': puzzles, 'errors': errors}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parse crossnumber PDFs in bulk')
+    parser.add_argument('source', help='directory of PDFs or a range such as 1-250')
+    parser.add_argument('--folder', default='.', help='where numbered PDFs live')
+    parser.add_argument('-o', '--output', default='index.json')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    index = parse_all(find_files(args.source, args.folder), args.workers)
+    with open(args.output, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    print(f'{len(index["puzzles"])} parsed, {len(index["errors"])} failed')
+    for filename, error in index['errors'].items():
+        print(f'    {filename}: {error}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+'''Solves crossnumbers in bulk without a display, one JSON line per puzzle.
+
+    python batchsolve.py puzzles/ -o solutions.jsonl --timeout 60
+    python batchsolve.py 1-250 --folder puzzles -o solutions.jsonl
+    python batchsolve.py index.json -o solutions.jsonl
+
+Sources are PDFs, a directory or numeric range of them, a batchparse index
+or a single parsed puzzle saved as JSON.'''
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import sys
+import time
+
+import batchparse
+import cluecompiler
+import propagate
+import puzzlecache
+import runcrossnumber
+import solver
+
+def find_puzzles(sources, folder='.'):
+    '''(name, filename or parsed data) for every puzzle the sources name'''
+    puzzles = []
+    for source in sources:
+        if source.endswith('.json'):
+            with open(source) as f:
+                data = json.load(f)
+            if 'puzzles' in data:
+                puzzles.extend(data['puzzles'].items())
+            else:
+                puzzles.append((source, data))
+        elif source.endswith('.pdf'):
+            puzzles.append((source, source))
+        else:
+            puzzles.extend((filename, filename)
+                    for filename in batchparse.find_files(source, folder))
+    return puzzles
+
+def solution(game, hints):
+    '''Every clue's answer, or None where its cells are not all solved'''
+    answers = {}
+    for clueref, clue in game.clues_by_clueref.items():
+        digits = [hints[(cell.x, cell.y)] for cell in clue.cells]
+        if all(len(digit) == 1 for digit in digits):
+            answers[clue.getname(clueref)] = int(''.join(str(min(d)) for d in digits))
+        else:
+            answers[clue.getname(clueref)] = None
+    return answers
+
+def solve_puzzle(name, source, timeout=None, nodes=None):
+    '''Loads, builds and solves one puzzle on a headless Game, searching for
+    at most timeout seconds and nodes branches.
+    Returns the JSON line for it as a dict'''
+    output = io.StringIO()
+    timings = {}
+    record = {'puzzle': name}
+    timedout = False
+    try:
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            data = puzzlecache.load(source) if isinstance(source, str) else source
+            timings['load'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            game = runcrossnumber.Game(None)
+            game.build(data)
+            checks, unknown = cluecompiler.compile_game(game)
+            timings['build'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            propagator = propagate.Propagator.from_game(game, checks,
+                    cache=game.evalcache)
+            hints = None
+            try:
+                if propagator.run():
+                    hints = solver.search(propagator, solver.Budget(nodes, timeout))
+            except solver.OutOfBudget as e:
+                timedout = True
+                record['branches'] = e.args[0]
+            timings['solve'] = time.perf_counter() - start
+    except Exception as e:
+        message = ' '.join(output.getvalue().split() + [type(e).__name__, str(e)])
+        record['error'] = message.strip()
+    else:
+        record['solved'] = hints is not None
+        record['timedout'] = timedout
+        record['solution'] = solution(game, hints) if hints is not None else None
+        record['unrecognised'] = sum(len(texts) for texts in unknown.values())
+        record['cachehits'] = game.evalcache.hits
+        record['cachemisses'] = game.evalcache.misses
+    record['timings'] = {phase: round(seconds * 1000, 3)
+            for phase, seconds in timings.items()}
+    return record
+
+def solve_all(puzzles, output, workers=None, timeout=None, nodes=None):
+    '''Writes a JSON line per puzzle as soon as it is solved.
+    Returns (solved, failed)'''
+    solved = failed = 0
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(solve_puzzle, name, source, timeout, nodes)
+                for name, source in puzzles]
+        for future in concurrent.futures.as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record, separators=(',', ':')) + '\n')
+            if record.get('solved'):
+                solved += 1
+            else:
+                failed += 1
+    return solved, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve crossnumbers without a display')
+    parser.add_argument('source', nargs='+',
+            help='PDFs, a directory, a range such as 1-250, or parsed JSON')
+    parser.add_argument('--folder', default='.', help='where numbered PDFs live')
+    parser.add_argument('-o', '--output', default='-', help='JSON lines file, - for stdout')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None,
+            help='seconds to search each puzzle before giving up')
+    parser.add_argument('--nodes', type=int, default=None,
+            help='branches to try on each puzzle before giving up')
+    args = parser.parse_args(argv)
+
+    puzzles = find_puzzles(args.source, args.folder)
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        output = sys.stdout if args.output == '-' else stack.enter_context(
+                open(args.output, 'w'))
+        solved, failed = solve_all(puzzles, output, args.workers,
+                args.timeout, args.nodes)
+    elapsed = time.perf_counter() - start
+    rate = len(puzzles) / elapsed if elapsed else 0
+    print(f'{solved} solved, {failed} unsolved or failed in {elapsed:.1f} s '
+            f'({rate:.2f} puzzles/s)', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
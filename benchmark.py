@@ -0,0 +1,326 @@
+'''Times the puzzle pipeline on synthetic crossnumbers, without a PDF.
+
+    python benchmark.py --size 15 --save-baseline baseline.json
+    python benchmark.py --size 15 --baseline baseline.json
+
+Phases that need a window are skipped when Tk cannot start one.'''
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import boardstate
+import cluecompiler
+import cluetokenizer
+import depgraph
+import journal
+import movequeue
+import pdfparse
+import propagate
+
+PITCH = 35.0
+ORIGIN = (52.0, 91.0)
+
+def runs(white, size):
+    '''(x, y, direction, length) of every run of two or more white cells'''
+    output = []
+    for y in range(size):
+        for x in range(size):
+            if (x, y) not in white:
+                continue
+            for direction, (dx, dy) in (('A', (1, 0)), ('D', (0, 1))):
+                if (x - dx, y - dy) in white or (x + dx, y + dy) not in white:
+                    continue
+                length = 1
+                while (x + dx*length, y + dy*length) in white:
+                    length += 1
+                output.append((x, y, direction, length))
+    return output
+
+def clue_text(value, length, earlier, rng):
+    '''A clue the value satisfies, sometimes referring to an earlier clue'''
+    smaller = [name for name, other in earlier if other < value]
+    larger = [name for name, other in earlier if other > value]
+    if smaller and rng.random() < 0.3:
+        return f'Greater than {rng.choice(smaller)}.'
+    if larger and rng.random() < 0.3:
+        return f'Less than {rng.choice(larger)}.'
+    options = [f'Digit sum {sum(map(int, str(value)))}.']
+    divisors = [d for d in range(2, 50) if value % d == 0]
+    if divisors:
+        options.append(f'Multiple of {rng.choice(divisors)}.')
+    if str(value) == str(value)[::-1]:
+        options.append('Palindrome.')
+    if length > 1:
+        options.append(f'Greater than {value - rng.randint(1, 10**(length - 1))}.')
+    return rng.choice(options)
+
+def generate(size=15, density=0.2, seed=0):
+    '''Random size x size puzzle with a hidden solution.
+    Returns the data Game.build takes plus the solution by xy'''
+    rng = random.Random(seed)
+    white = set()
+    for y in range(size):
+        for x in range(size):
+            if rng.random() >= density:
+                white.add((x, y))
+                white.add((size - 1 - x, size - 1 - y))
+    white -= {(x, y) for x, y in list(white)
+            if all((x + dx, y + dy) not in white
+                    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)))}
+
+    found = runs(white, size)
+    heads = {(x, y) for x, y, direction, length in found}
+    solution = {xy: rng.randint(1 if xy in heads else 0, 9) for xy in white}
+    cluenum = {}
+    for x, y in sorted(heads, key=lambda xy: (xy[1], xy[0])):
+        cluenum[(x, y)] = len(cluenum) + 1
+
+    clues = []
+    earlier = []
+    for x, y, direction, length in sorted(found,
+            key=lambda run: (run[2], cluenum[run[:2]])):
+        dx, dy = (1, 0) if direction == 'A' else (0, 1)
+        value = int(''.join(str(solution[(x + dx*i, y + dy*i)])
+                for i in range(length)))
+        num = cluenum[(x, y)]
+        clues.append((num, direction, clue_text(value, length, earlier, rng), length))
+        earlier.append((f'{num}{direction}', value))
+
+    anchors = [(num, x, y) for (x, y), num in sorted(cluenum.items(),
+            key=lambda item: item[1])]
+    return {'anchors': anchors, 'clues': clues}, solution
+
+def page_text(data):
+    '''The clue page as PyMuPDF would extract it'''
+    lines = ['Crossnumber']
+    for header, direction in (('Across', 'A'), ('Down', 'D')):
+        lines.append(header)
+        for num, clue_direction, text, length in data['clues']:
+            if clue_direction == direction:
+                lines.append(f'{num} {text} ({length})')
+    return '\n'.join(lines) + '\n'
+
+def raw_locations(data, noise=1.5, seed=0):
+    '''Anchor label positions in PDF points, jittered like real fonts'''
+    rng = random.Random(seed)
+    return [(num, ORIGIN[0] + x*PITCH + rng.uniform(-noise, noise),
+            ORIGIN[1] + y*PITCH + rng.uniform(-noise, noise))
+            for num, x, y in data['anchors']]
+
+def build_model(data):
+    '''The parts of Game.build that do not need Tk.
+    Returns the board state, cells by clueref and references by clueref'''
+    state = boardstate.BoardState()
+    xy_by_cluenum = {}
+    for cluenum, x, y in data['anchors']:
+        state.add_cell(x, y, boardstate.ALL & ~1)
+        xy_by_cluenum[cluenum] = (x, y)
+    clue_cells = {}
+    clue_refs = {}
+    for cluenum, direction, cluetext, length in data['clues']:
+        x, y = xy_by_cluenum[cluenum]
+        cells = [(x + i, y) if direction == 'A' else (x, y + i) for i in range(length)]
+        for xy in cells:
+            if xy not in state.id_by_xy:
+                state.add_cell(*xy)
+        clueref = (cluenum, direction)
+        state.add_clue(clueref, [state.id_by_xy[xy] for xy in cells])
+        clue_cells[clueref] = cells
+        cluestyle, refrences = cluecompiler.split_clue(cluetext)
+        clue_refs[clueref] = [cluecompiler.parse_ref(ref) for ref in refrences
+                if ref[-1] in 'AD']
+    return state, clue_cells, clue_refs
+
+def compile_checks(data):
+    checks = {}
+    for cluenum, direction, cluetext, length in data['clues']:
+        cluestyle, refrences = cluecompiler.split_clue(cluetext)
+        check = cluecompiler.compile_clue(cluestyle, refrences, length)
+        if check is not None:
+            checks[(cluenum, direction)] = check
+    return checks
+
+def timed(func, repeat):
+    '''Best of repeat runs in milliseconds, and the last result'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+class Item:
+    '''Stands in for a Cell or Clue when timing the Highlighter'''
+    def __init__(self):
+        self.calls = 0
+
+    def highlight(self, isselected, ispassiveselected):
+        self.calls += 1
+
+def select_all(clue_cells, highlighter):
+    '''Selects every cell in turn the way Game.select builds highlights'''
+    items = {}
+    clues_by_xy = {}
+    for clueref, cells in clue_cells.items():
+        items[clueref] = Item()
+        for xy in cells:
+            items.setdefault(xy, Item())
+            clues_by_xy.setdefault(xy, []).append(clueref)
+    for xy, clues in clues_by_xy.items():
+        highlights = {items[clues[-1]]: (False, True)} if len(clues) == 2 else {}
+        highlights[items[clues[0]]] = (True, False)
+        for other in clue_cells[clues[0]]:
+            highlights[items[other]] = (False, True)
+        highlights[items[xy]] = (True, False)
+        highlighter.apply(highlights)
+    return sum(item.calls for item in items.values())
+
+def run_headless(data, solution, repeat):
+    import runcrossnumber
+
+    results = {}
+    text = page_text(data)
+    locations = raw_locations(data)
+
+    def parse():
+        cleaner = cluetokenizer.Cleaner({'𝑥': 'x', '𝟤': '^2', '𝟢': '0'})
+        clues = pdfparse.process_clue_text(text)
+        return [cluecompiler.split_clue(cleaner(clue.text)) for clue in clues]
+    results['parse'], parsed = timed(parse, repeat)
+    assert len(parsed) == len(data['clues'])
+
+    results['layout'], anchors = timed(
+            lambda: pdfparse.process_clue_locations(locations), repeat)
+    assert [tuple(anchor) for anchor in anchors] == [tuple(anchor)
+            for anchor in data['anchors']]
+
+    def build():
+        state, clue_cells, clue_refs = build_model(data)
+        return state, depgraph.DependencyGraph(clue_cells, clue_refs)
+    results['build'], (state, graph) = timed(build, repeat)
+
+    checks = compile_checks(data)
+    def settle():
+        propagator = propagate.Propagator(state, graph, checks)
+        propagator.run()
+        return propagator
+    results['propagate'], propagator = timed(settle, repeat)
+    assert all(solution[xy] in digits for xy, digits in propagator.hints.items())
+
+    rng = random.Random(0)
+    moves = movequeue.MoveQueue()
+    for _ in range(20 * state.size):
+        moves.add(rng.randrange(state.size), rng.randrange(1, 1024))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench')
+        def saveload():
+            with open(path + '.sav', 'w') as f:
+                json.dump([(x, y, tuple(digits))
+                        for (x, y), digits in propagator.hints.items()], f)
+            with open(path + '.moves', 'wb') as f:
+                f.write(moves.save())
+            with open(path + '.sav') as f:
+                json.load(f)
+            with open(path + '.moves', 'rb') as f:
+                movequeue.MoveQueue().load(f.read())
+            autosave = journal.Journal(path, state)
+            for cellid, mask in zip(moves._cells, moves._masks):
+                autosave.record(cellid, mask)
+            autosave.close()
+            return journal.recover(path, state.size)
+        results['saveload'], recovered = timed(saveload, repeat)
+        assert recovered is not None
+
+    results['select'], calls = timed(
+            lambda: select_all(graph.clue_cells, runcrossnumber.Highlighter()), repeat)
+    return results
+
+def run_tk(data, repeat):
+    '''Board construction and selection in a real window.
+    Returns the timings, or the reason they could not be taken'''
+    import tkinter as tk
+    import runcrossnumber
+
+    results = {}
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return f'no display ({e})'
+    try:
+        def build():
+            game = runcrossnumber.Game(root)
+            game.build(data)
+            root.update_idletasks()
+            return game
+        try:
+            results['tk build'], game = timed(build, 1)
+        except (AttributeError, tk.TclError) as e:
+            return f'Game cannot start here ({type(e).__name__}: {e})'
+
+        def select():
+            for cell in game.cell_by_xy.values():
+                game.select(cell)
+                root.update_idletasks()
+        results['tk select'], _ = timed(select, repeat)
+    finally:
+        root.destroy()
+    return results
+
+def compare(results, baseline, threshold):
+    '''Prints every phase against the baseline. Returns the regressed phases'''
+    regressed = []
+    for phase, ms in results.items():
+        if phase not in baseline:
+            print(f'{phase:>10} {ms:10.2f} ms')
+            continue
+        ratio = ms / baseline[phase] if baseline[phase] else 1
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressed.append(phase)
+        print(f'{phase:>10} {ms:10.2f} ms  baseline {baseline[phase]:10.2f} ms'
+                f'  {ratio:5.2f}x{flag}')
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark on synthetic puzzles')
+    parser.add_argument('--size', type=int, default=15, help='grid width and height')
+    parser.add_argument('--density', type=float, default=0.2,
+            help='fraction of blocked squares')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='best of this many runs')
+    parser.add_argument('--baseline', help='JSON timings to compare against')
+    parser.add_argument('--save-baseline', help='write the timings here')
+    parser.add_argument('--threshold', type=float, default=1.25,
+            help='slowdown ratio reported as a regression')
+    parser.add_argument('--no-tk', action='store_true', help='skip the window phases')
+    args = parser.parse_args(argv)
+
+    data, solution = generate(args.size, args.density, args.seed)
+    print(f'{args.size}x{args.size} grid, {len(solution)} cells, '
+            f'{len(data["clues"])} clues')
+    results = run_headless(data, solution, args.repeat)
+    if not args.no_tk:
+        tkresults = run_tk(data, args.repeat)
+        if isinstance(tkresults, str):
+            print(f'Skipping Tk phases: {tkresults}')
+        else:
+            results.update(tkresults)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressed = compare(results, baseline, args.threshold)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
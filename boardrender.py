@@ -0,0 +1,212 @@
+import functools
+import time
+import tkinter as tk
+import tkinter.font as tkfont
+import types
+
+import stats
+
+class RenderScheduler:
+    '''Collects the cells and clues whose look changed and repaints them
+    together on the next idle tick.
+
+    Remembers the options last sent to each item, so repainting something
+    that did not really change costs no Tcl calls.'''
+    def __init__(self, widget):
+        self.widget = widget
+        self.dirty = {}
+        self.pending = None
+        self.configured = {}
+
+    def mark(self, obj):
+        '''Queues anything with a render(scheduler) method'''
+        self.dirty[obj] = None
+        if self.pending is None:
+            self.pending = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        '''Repaints everything queued. If one render raises, the objects
+        after it are queued again for the next idle tick'''
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+        dirty, self.dirty = self.dirty, {}
+        if stats.enabled:
+            stats.count('render', len(dirty))
+        remaining = iter(dirty)
+        try:
+            for obj in remaining:
+                obj.render(self)
+        finally:
+            for obj in remaining:
+                self.mark(obj)
+
+    def seed(self, key, **options):
+        '''Records options an item was created with'''
+        self.configured[key] = options
+
+    def changed(self, key, options):
+        last = self.configured.setdefault(key, {})
+        output = {option: value for option, value in options.items()
+                if last.get(option) != value}
+        last.update(output)
+        return output
+
+    def itemconfigure(self, canvas, item, **options):
+        options = self.changed(item, options)
+        if options:
+            if stats.enabled:
+                stats.count('itemconfigure')
+            canvas.itemconfigure(item, **options)
+
+class NullScheduler:
+    '''Stands in for RenderScheduler when the game has no window'''
+    def mark(self, obj):
+        pass
+
+    def flush(self):
+        pass
+
+class BoardRenderer:
+    '''Creates the canvas items for every cell of a board.
+
+    One set of fonts is shared by the whole board, the items for many cells
+    are created by a single Tcl script, and the mouse bindings sit on the
+    shared 'cell' tag instead of on each rectangle.'''
+    def __init__(self, canvas, cellsize, xoff, yoff, foreground, hintcolor,
+            scheduler=None):
+        self.canvas = canvas
+        self.scheduler = scheduler
+        self.cellsize = cellsize
+        self.xoff = xoff
+        self.yoff = yoff
+        self.foreground = foreground
+        self.hintcolor = hintcolor
+
+        self.labelfont = tkfont.Font(family='Helvetica', size=7, weight='bold')
+        self.hintfont = tkfont.Font(family='Helvetica', size=6)
+        self.bigfont = tkfont.Font(family='Helvetica', size=18)
+
+        self.cell_by_rect = {}
+        for sequence, method in (('<Button-1>', 'on_click'),
+                ('<Enter>', 'on_enter'), ('<Leave>', 'on_leave')):
+            canvas.tag_bind('cell', sequence, functools.partial(self.dispatch, method))
+
+    def dispatch(self, method, event=None):
+        '''Forwards a 'cell' tag event to the cell under the mouse'''
+        items = self.canvas.find_withtag('current')
+        if items and items[0] in self.cell_by_rect:
+            getattr(self.cell_by_rect[items[0]], method)(event)
+
+    def cell_commands(self, cell):
+        '''Tcl commands creating one cell's items, rectangle first, and the
+        options each item starts with'''
+        path = str(self.canvas)
+        xpixel = self.xoff + cell.x*self.cellsize
+        ypixel = self.yoff + cell.y*self.cellsize
+        hints = cell.availablehints
+        commands = [f'[{path} create rectangle {xpixel} {ypixel} '
+                f'{xpixel + self.cellsize} {ypixel + self.cellsize} '
+                f'-fill {self.foreground} -tags cell]']
+        options = [{'fill': self.foreground}]
+        if cell.text:
+            commands.append(f'[{path} create text {xpixel + 1} {ypixel - 1} '
+                    f'-anchor nw -text {cell.text} -font {self.labelfont} '
+                    f'-state disabled]')
+            options.append({})
+        for digit in range(10):
+            div, mod = divmod(digit+2, 3)
+            if digit in hints and len(hints) > 1:
+                state = tk.DISABLED
+            else:
+                state = tk.HIDDEN
+            commands.append(f'[{path} create text {xpixel + 9 + mod*8} '
+                    f'{ypixel + 5 + div*8} -text {digit} -font {self.hintfont} '
+                    f'-state {state} -disabledfill {self.hintcolor}]')
+            options.append({'state': state})
+        if len(hints) == 1:
+            (text,) = hints
+            state = tk.DISABLED
+            options.append({'text': text, 'state': state})
+        else:
+            text = '{}'
+            state = tk.HIDDEN
+            options.append({'state': state})
+        commands.append(f'[{path} create text {xpixel + self.cellsize/2} '
+                f'{ypixel + self.cellsize/2} -text {text} -font {self.bigfont} '
+                f'-state {state} -disabledfill {self.hintcolor}]')
+        return commands, options
+
+    def create_cells(self, cells):
+        '''Creates the items for all cells in one Tcl round trip and stores
+        their ids on the cells as rect, digitlist and bigone'''
+        cells = list(cells)
+        commands = ['list']
+        options = []
+        for cell in cells:
+            cellcommands, celloptions = self.cell_commands(cell)
+            commands.extend(cellcommands)
+            options.extend(celloptions)
+        ids = [int(item) for item in
+                self.canvas.tk.splitlist(self.canvas.tk.eval(' '.join(commands)))]
+        if self.scheduler is not None:
+            for item, itemoptions in zip(ids, options):
+                self.scheduler.seed(item, **itemoptions)
+
+        position = 0
+        for cell in cells:
+            cell.rect = ids[position]
+            position += 2 if cell.text else 1
+            cell.digitlist = ids[position:position + 10]
+            cell.bigone = ids[position + 10]
+            position += 11
+            self.cell_by_rect[cell.rect] = cell
+
+def create_cells_one_by_one(canvas, cells, cellsize, xoff, yoff):
+    '''How Cell.__init__ used to build its items, kept for timing_report'''
+    for cell in cells:
+        helv1 = tkfont.Font(family='Helvetica', size=7, weight='bold')
+        helv2 = tkfont.Font(family='Helvetica', size=6)
+        helv3 = tkfont.Font(family='Helvetica', size=18)
+        xpixel = xoff + cell.x*cellsize
+        ypixel = yoff + cell.y*cellsize
+        rect = canvas.create_rectangle(xpixel, ypixel,
+                xpixel + cellsize, ypixel + cellsize, fill='White')
+        if cell.text:
+            canvas.create_text(xpixel + 1, ypixel - 1, anchor=tk.NW,
+                    text=cell.text, font=helv1, state=tk.DISABLED)
+        for sequence in ('<Button-1>', '<Enter>', '<Leave>'):
+            canvas.tag_bind(rect, sequence, lambda event: None)
+        for digit in range(10):
+            div, mod = divmod(digit+2, 3)
+            canvas.create_text(xpixel + 9 + mod*8, ypixel + 5 + div*8,
+                    text=digit, font=helv2, state=tk.DISABLED)
+        canvas.create_text(xpixel + cellsize/2, ypixel + cellsize/2,
+                text='', font=helv3, state=tk.HIDDEN)
+
+def timing_report(size=30):
+    '''Times building a size x size board both ways'''
+    root = tk.Tk()
+    cells = [types.SimpleNamespace(x=x, y=y, text=(x + y*size + 1) if x % 4 == 0 else None,
+            availablehints=frozenset(range(10))) for y in range(size) for x in range(size)]
+
+    canvas = tk.Canvas(root)
+    start = time.perf_counter()
+    create_cells_one_by_one(canvas, cells, 35, 5, 5)
+    root.update_idletasks()
+    old = time.perf_counter() - start
+    canvas.destroy()
+
+    canvas = tk.Canvas(root)
+    start = time.perf_counter()
+    BoardRenderer(canvas, 35, 5, 5, 'White', '#191A17').create_cells(cells)
+    root.update_idletasks()
+    new = time.perf_counter() - start
+    root.destroy()
+
+    print(f'{size}x{size} grid, {len(cells)} cells')
+    print(f'    one call per item: {old*1000:8.1f} ms')
+    print(f'    batched:           {new*1000:8.1f} ms ({old/new:.1f}x)')
+
+if __name__ == '__main__':
+    timing_report()
@@ -0,0 +1,79 @@
+import numpy as np
+
+# Bit d of a cell's mask is set while digit d is still an available hint
+ALL = (1 << 10) - 1
+DIGITSETS = tuple(frozenset(d for d in range(10) if mask >> d & 1)
+        for mask in range(ALL + 1))
+POPCOUNT = np.array([len(digits) for digits in DIGITSETS], dtype=np.uint8)
+
+def mask_of(digits):
+    mask = 0
+    for digit in digits:
+        mask |= 1 << digit
+    return mask
+
+class BoardState:
+    '''Every cell's hints as one uint16 mask in a flat array indexed by cell id.
+
+    Cells and clues only keep their ids, so a whole board can be copied,
+    hashed or compared with a handful of array operations.'''
+    def __init__(self, capacity=64):
+        self.masks = np.zeros(capacity, dtype=np.uint16)
+        self.size = 0
+        self.xy_by_id = []
+        self.id_by_xy = {}
+        self.clue_cells = {}
+
+    def add_cell(self, x, y, mask=ALL):
+        if self.size == len(self.masks):
+            self.masks = np.concatenate([self.masks, np.zeros_like(self.masks)])
+        cellid = self.size
+        self.masks[cellid] = mask
+        self.size += 1
+        self.xy_by_id.append((x, y))
+        self.id_by_xy[(x, y)] = cellid
+        return cellid
+
+    def add_clue(self, clueref, cellids):
+        self.clue_cells[clueref] = np.array(cellids, dtype=np.intp)
+
+    def mask(self, cellid):
+        return int(self.masks[cellid])
+
+    def hints(self, cellid):
+        return DIGITSETS[self.masks[cellid]]
+
+    def toggle(self, cellid, mask):
+        self.masks[cellid] ^= mask
+
+    def clue_masks(self, clueref):
+        return self.masks[self.clue_cells[clueref]]
+
+    def counts(self):
+        '''Number of hints left in each cell'''
+        return POPCOUNT[self.masks[:self.size]]
+
+    def copy(self):
+        '''Copies the masks; the cell and clue layout is shared'''
+        output = BoardState.__new__(BoardState)
+        output.__dict__.update(self.__dict__)
+        output.masks = self.masks.copy()
+        return output
+
+    def snapshot(self):
+        return self.masks[:self.size].tobytes()
+
+    def restore(self, snapshot):
+        self.masks[:self.size] = np.frombuffer(snapshot, dtype=np.uint16)
+
+    def diff(self, other):
+        '''Ids of cells whose hints differ from other, and the XOR of their masks'''
+        xor = self.masks[:self.size] ^ other.masks[:self.size]
+        cellids = np.flatnonzero(xor)
+        return cellids, xor[cellids]
+
+    def __eq__(self, other):
+        return self.snapshot() == other.snapshot()
+
+    def __hash__(self):
+        return hash(self.snapshot())
@@ -0,0 +1,80 @@
+'''Candidate numbers for a run of cells, given each cell's available hints.
+
+Nothing here builds the full list of candidates; long clues can have more
+than 10^10 of them.'''
+import itertools
+import random
+
+def count(digitsets):
+    '''Exact number of candidates, as a product over the cells'''
+    prod = 1
+    for digits in digitsets:
+        prod *= len(digits)
+    return prod
+
+def minimum(digitsets):
+    '''Smallest candidate, or None if some cell has no hints left'''
+    if not all(digitsets):
+        return None
+    return int(''.join(str(min(digits)) for digits in digitsets))
+
+def maximum(digitsets):
+    '''Largest candidate, or None if some cell has no hints left'''
+    if not all(digitsets):
+        return None
+    return int(''.join(str(max(digits)) for digits in digitsets))
+
+def iterate(digitsets, low=None, high=None):
+    '''Yields candidates in increasing order, limited to low <= n <= high'''
+    digits = [sorted(d) for d in digitsets]
+    length = len(digits)
+    if low is not None:
+        low = [int(char) for char in str(max(low, 0)).zfill(length)]
+        if len(low) > length:
+            return
+    if high is not None:
+        if high < 0:
+            return
+        high = [int(char) for char in str(high).zfill(length)]
+        if len(high) > length:
+            high = None
+
+    def walk(position, prefix, tightlow, tighthigh):
+        if not (tightlow or tighthigh):
+            for combo in itertools.product(*digits[position:]):
+                number = prefix
+                for digit in combo:
+                    number = number*10 + digit
+                yield number
+            return
+        for digit in digits[position]:
+            if tightlow and digit < low[position]:
+                continue
+            if tighthigh and digit > high[position]:
+                break
+            if position + 1 == length:
+                yield prefix*10 + digit
+            else:
+                yield from walk(position + 1, prefix*10 + digit,
+                        tightlow and digit == low[position],
+                        tighthigh and digit == high[position])
+
+    if length:
+        yield from walk(0, 0, low is not None, high is not None)
+
+def number_at(digitsets, index):
+    '''The index-th candidate in increasing order'''
+    output = 0
+    for digits in digitsets:
+        digits = sorted(digits)
+        stride = count(digitsets) // len(digits)
+        position, index = divmod(index, stride)
+        output = output*10 + digits[position]
+        digitsets = digitsets[1:]
+    return output
+
+def sample(digitsets, k=1, rng=random):
+    '''k distinct candidates chosen uniformly at random'''
+    digitsets = list(digitsets)
+    return [number_at(digitsets, index)
+            for index in rng.sample(range(count(digitsets)), k)]
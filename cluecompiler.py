@@ -0,0 +1,236 @@
+import collections
+import math
+import re
+
+import numpy as np
+
+import numbertables
+
+# Referenced clues with more candidates than this are not used to prune
+MAX_REF_VALUES = 2000
+
+STYLES = {}
+REFERENCE = '[0-9]+[AD]|[0-9,]+'
+
+def style(*parts):
+    '''Registers a predicate for a normalized clue style'''
+    def register(func):
+        STYLES[parts] = func
+        return func
+    return register
+
+def split_clue(cluetext):
+    '''Splits a clue into its style, the text around the numbers, and the
+    numbers and clue references themselves'''
+    return (tuple(re.split(REFERENCE, cluetext)),
+            tuple(re.findall(REFERENCE, cluetext)))
+
+def normalize(cluestyle):
+    '''Lowercases a Clue.cluestyle tuple and drops articles and full stops
+    so "A square." and "Square" compile the same way'''
+    parts = []
+    for part in cluestyle:
+        part = ' '.join(part.lower().replace('.', ' ').split())
+        parts.append(part)
+    parts[0] = re.sub('^(a|an|the) ', '', parts[0])
+    return tuple(parts)
+
+def parse_ref(ref):
+    '''Clue references become clueref tuples, numbers become ints'''
+    if ref[-1] in 'AD':
+        return (int(ref[:-1]), ref[-1])
+    return int(ref.replace(',', ''))
+
+class CompiledClue:
+    '''Vectorized check for one clue, callable as a Propagator check.
+    Clues with equal keys give equal results for equal cell hints'''
+    def __init__(self, predicate, refs, length, key=None):
+        self.predicate = predicate
+        self.refs = refs
+        self.length = length
+        self.key = key
+
+    def refvalues(self, lookup):
+        '''Current values of every reference, or None if any is unknown.
+        A reference with no values left, which the board already shows as
+        an error, is treated as unknown too'''
+        output = []
+        for ref in self.refs:
+            if isinstance(ref, tuple):
+                values = lookup(ref)
+                if values is None or not 0 < len(values) <= MAX_REF_VALUES:
+                    return None
+                output.append(np.unique(np.asarray(values, dtype=np.int64)))
+            else:
+                output.append(np.array([ref], dtype=np.int64))
+        return output
+
+    def mask(self, numbers, lookup):
+        numbers = np.asarray(numbers, dtype=np.int64)
+        refvalues = self.refvalues(lookup)
+        if refvalues is None:
+            return np.ones(len(numbers), dtype=bool)
+        return self.predicate(numbers, self.length, *refvalues)
+
+    def __call__(self, numbers, propagator):
+        numbers = np.asarray(numbers, dtype=np.int64)
+        return numbers[self.mask(numbers, propagator.values)]
+
+def compile_clue(cluestyle, refrences, length):
+    '''Returns a CompiledClue, or None if the style is not recognised'''
+    parts = normalize(cluestyle)
+    predicate = STYLES.get(parts)
+    if predicate is None:
+        return None
+    refs = tuple(parse_ref(ref) for ref in refrences)
+    return CompiledClue(predicate, refs, length, (parts, refs, length))
+
+def compile_game(game):
+    '''Compiles every clue of a game.
+    Returns the checks by clueref and the unrecognised clue texts by style'''
+    checks = {}
+    unknown = collections.defaultdict(list)
+    for clueref, clue in game.clues_by_clueref.items():
+        check = compile_clue(clue.cluestyle, clue.refrences, clue.length)
+        if check is None:
+            unknown[clue.cluestyle].append(clue.cluetext)
+        else:
+            checks[clueref] = check
+    return checks, unknown
+
+def report(unknown):
+    for cluestyle, cluetexts in sorted(unknown.items(), key=lambda x: -len(x[1])):
+        print(f'Unrecognised clue style {cluestyle} ({len(cluetexts)} clues)')
+        for cluetext in cluetexts:
+            print('     ', cluetext)
+
+def digits(numbers, length):
+    '''Digit matrix, most significant digit first'''
+    powers = 10 ** np.arange(length - 1, -1, -1, dtype=np.int64)
+    return (numbers[:, None] // powers) % 10
+
+def isqrt(numbers):
+    root = np.sqrt(numbers.astype(np.float64)).astype(np.int64)
+    root -= root * root > numbers
+    root += (root + 1) * (root + 1) <= numbers
+    return root
+
+def any_ref(numbers, values, test):
+    '''ORs test(numbers, value) over every value a reference can take'''
+    mask = np.zeros(len(numbers), dtype=bool)
+    for value in values:
+        mask |= test(numbers, int(value))
+    return mask
+
+def outer(values1, values2, op):
+    if len(values1) * len(values2) > MAX_REF_VALUES**2 // 4:
+        return None
+    return op.outer(values1, values2).ravel()
+
+@style('square')
+def is_square(numbers, length):
+    if numbertables.covers('square', numbers, length):
+        return numbertables.mask('square', numbers, length)
+    root = isqrt(numbers)
+    return root * root == numbers
+
+@style('cube')
+def is_cube(numbers, length):
+    if numbertables.covers('cube', numbers, length):
+        return numbertables.mask('cube', numbers, length)
+    root = np.round(np.cbrt(numbers.astype(np.float64))).astype(np.int64)
+    return root * root * root == numbers
+
+@style('prime')
+def is_prime(numbers, length):
+    if numbertables.covers('prime', numbers, length):
+        return numbertables.mask('prime', numbers, length)
+    mask = numbers > 1
+    if len(numbers):
+        for p in numbertables.primes_upto(math.isqrt(int(numbers.max()))):
+            mask &= (numbers % p != 0) | (numbers == p)
+    return mask
+
+@style('triangular number')
+def is_triangular(numbers, length):
+    if numbertables.covers('triangular', numbers, length):
+        return numbertables.mask('triangular', numbers, length)
+    return is_square(8*numbers + 1, length)
+
+@style('fibonacci number')
+def is_fibonacci(numbers, length):
+    if numbertables.covers('fibonacci', numbers, length):
+        return numbertables.mask('fibonacci', numbers, length)
+    fibs = [1, 2]
+    while fibs[-1] < 10**length:
+        fibs.append(fibs[-1] + fibs[-2])
+    return np.isin(numbers, fibs)
+
+@style('palindrome')
+def is_palindrome(numbers, length):
+    matrix = digits(numbers, length)
+    return (matrix == matrix[:, ::-1]).all(axis=1)
+
+@style('multiple of', '')
+def is_multiple(numbers, length, values):
+    return any_ref(numbers, values[values != 0],
+            lambda numbers, value: numbers % value == 0)
+
+@style('factor of', '')
+def is_factor(numbers, length, values):
+    return any_ref(numbers, values, lambda numbers, value: value % numbers == 0)
+
+@style('square of', '')
+def is_square_of(numbers, length, values):
+    return np.isin(numbers, values * values)
+
+@style('cube of', '')
+def is_cube_of(numbers, length, values):
+    return np.isin(numbers, values * values * values)
+
+@style('power of', '')
+def is_power(numbers, length, values):
+    powers = set()
+    for value in values[values > 1].tolist():
+        power = value
+        while power < 10**length:
+            powers.add(power)
+            power *= value
+    return np.isin(numbers, list(powers))
+
+@style('reverse of', '')
+def is_reverse(numbers, length, values):
+    return np.isin(numbers, [int(str(value)[::-1]) for value in values.tolist()])
+
+@style('digit sum', '')
+def has_digit_sum(numbers, length, values):
+    return np.isin(digits(numbers, length).sum(axis=1), values)
+
+@style('greater than', '')
+def is_greater(numbers, length, values):
+    return numbers > values.min()
+
+@style('less than', '')
+def is_less(numbers, length, values):
+    return numbers < values.max()
+
+def in_combined(numbers, values1, values2, op):
+    combined = outer(values1, values2, op)
+    if combined is None:
+        return np.ones(len(numbers), dtype=bool)
+    return np.isin(numbers, combined)
+
+@style('sum of', 'and', '')
+def is_sum(numbers, length, values1, values2):
+    return in_combined(numbers, values1, values2, np.add)
+
+@style('product of', 'and', '')
+def is_product(numbers, length, values1, values2):
+    return in_combined(numbers, values1, values2, np.multiply)
+
+@style('difference between', 'and', '')
+def is_difference(numbers, length, values1, values2):
+    combined = outer(values1, values2, np.subtract)
+    if combined is None:
+        return np.ones(len(numbers), dtype=bool)
+    return np.isin(numbers, np.abs(combined))
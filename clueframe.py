@@ -1,53 +1,154 @@
+import bisect
 import tkinter as tk
+import tkinter.font as tkfont
+
+class ClueRow(tk.Frame):
+    '''Widgets for one visible clue, rebound to other clues while scrolling'''
+    def __init__(self, parent, onclick):
+        super().__init__(parent)
+        self.row = None
+        self.label1 = tk.Label(self, width=2, anchor=tk.NE)
+        self.label1.grid(row=0, column=0, sticky=tk.NSEW)
+        self.label2 = tk.Label(self, width=34, wraplength=200,
+                anchor=tk.NW, justify=tk.LEFT)
+        self.label2.grid(row=0, column=1, sticky=tk.NSEW)
+        self.label3 = tk.Label(self, width=2, anchor=tk.NE)
+        self.label3.grid(row=0, column=2, sticky=tk.NSEW)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.labels = (self.label1, self.label2, self.label3)
+        self.defaultbg = self.label1.cget('bg')
+        for item in self.labels:
+            item.bind('<Button-1>', lambda event: onclick(self, event))
 
 class ClueFrame(tk.Frame):
+    '''Scrolling list of clues.
+
+    Row heights are worked out from the font, so only the rows in view need
+    widgets; a small pool of ClueRows is rebound to clues as the list scrolls.'''
     def __init__(self, parent, title, *arg, **karg):
         super().__init__(parent, *arg, **karg)
         self.canvas = tk.Canvas(self, *arg, **karg)
-        self.frame = tk.Frame(self.canvas, *arg, **karg)
-        self.vsb = tk.Scrollbar(self, orient='vertical', command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vsb.set)
+        self.vsb = tk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.canvas.configure(yscrollcommand=self.on_scroll)
 
         self.vsb.pack(side='right', fill='y')
         self.canvas.pack(side='left', fill='both', expand=True)
-        self.canvas.create_window((0, 0), window=self.frame, anchor=tk.NW,
-                width=300, tags='self.frame')
-
-        #self.canvas.bind('<Configure>', self.onCanvasConfigure)
-        self.frame.bind('<Configure>', self.onFrameConfigure)
-        self.row = 1
-        titlebar = tk.Label(self.frame, text=title)
-        titlebar.grid(row=0, column=0, columnspan=3)
-        #self.frame.grid_columnconfigure(0, weight=0)
-        self.frame.grid_columnconfigure(1, weight=1)
-        #self.frame.grid_columnconfigure(2, weight=0)
-        #self.grid_rowconfigure(0, weight=1)
-        self.canvas.grid_rowconfigure(0, weight=1)
+        self.width = 300
+
+        titlebar = tk.Label(self.canvas, text=title)
+        self.font = tkfont.nametofont(titlebar.cget('font'))
+        self.linespace = self.font.metrics('linespace')
+        self.canvas.create_window((0, 0), window=titlebar, anchor=tk.NW,
+                width=self.width, height=self.linespace + 4)
+
+        self.canvas.bind('<Configure>', self.onCanvasConfigure)
         self.rows = []
+        self.offsets = [self.linespace + 4]
+        self.pool = []
+        self.bound = {}
+        self.pending = None
 
-    def addclue(self, cluenum, cluetext, cluelength):
-        label1 = tk.Label(self.frame, text=cluenum, width=2, anchor=tk.NE)
-        label1.grid(row=self.row, column=0, sticky=tk.NSEW)
+    def addclue(self, cluenum, cluetext, cluelength, onclick=None):
+        '''Adds a clue row and returns its index'''
+        self.rows.append([cluenum, cluetext, cluelength, None, onclick])
+        self.offsets.append(self.offsets[-1] + self.rowheight(cluetext))
+        self.schedule()
+        return len(self.rows) - 1
 
-        label2 = tk.Label(self.frame, text=cluetext, width=34, wraplength=200,
-                anchor=tk.NW, justify=tk.LEFT)
-        label2.grid(row=self.row, column=1, sticky=tk.NSEW)
-
-        label3 = tk.Label(self.frame, text=cluelength, width=2, anchor=tk.NE)
-        label3.grid(row=self.row, column=2, sticky=tk.NSEW)
-        self.rows.append((label1, label2, label3))
-        self.row += 1
-        return self.rows[-1]
-
-    def onFrameConfigure(self, event):
-        '''Reset the scroll region to encompass the inner frame'''
-        self.canvas.configure(scrollregion=self.canvas.bbox('all'))
-
-    # def onCanvasConfigure(self, event):
-    #     print('canvas event', event.width)
-    #     print('frame width before', self.frame.winfo_width())
-    #     self.frame.configure(width=event.width)
-    #     print('frame width after', self.frame.winfo_width())
+    def rowheight(self, cluetext):
+        '''Height of a row, wrapping the text the way label2 does'''
+        lines = 1
+        width = 0
+        space = self.font.measure(' ')
+        for word in cluetext.split():
+            wordwidth = self.font.measure(word)
+            if width and width + space + wordwidth > 200:
+                lines += 1
+                width = wordwidth
+            else:
+                width += (space if width else 0) + wordwidth
+        return lines*self.linespace + 4
+
+    def setcolor(self, row, color):
+        if self.rows[row][3] == color:
+            return
+        self.rows[row][3] = color
+        if row in self.bound:
+            for item in self.bound[row].labels:
+                item.configure(bg=color)
+
+    def schedule(self):
+        if self.pending is None:
+            self.pending = self.after_idle(self.refresh)
+
+    def refresh(self):
+        '''Binds pooled rows to whichever clues are now in view'''
+        self.pending = None
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.offsets[-1]))
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first = max(bisect.bisect_right(self.offsets, top) - 1, 0)
+        last = min(bisect.bisect_left(self.offsets, bottom), len(self.rows))
+        visible = range(first, last)
+
+        free = []
+        for row in list(self.bound):
+            if row not in visible:
+                cluerow = self.bound.pop(row)
+                self.canvas.itemconfigure(cluerow.window, state=tk.HIDDEN)
+                free.append(cluerow)
+        for row in visible:
+            if row not in self.bound:
+                self.bind_row(free.pop() if free else self.new_row(), row)
+
+    def new_row(self):
+        cluerow = ClueRow(self.canvas, self.on_rowclick)
+        cluerow.window = self.canvas.create_window((0, 0), window=cluerow,
+                anchor=tk.NW, width=self.width)
+        self.pool.append(cluerow)
+        return cluerow
+
+    def bind_row(self, cluerow, row):
+        cluenum, cluetext, cluelength, color, onclick = self.rows[row]
+        cluerow.row = row
+        cluerow.label1.configure(text=cluenum)
+        cluerow.label2.configure(text=cluetext)
+        cluerow.label3.configure(text=cluelength)
+        for item in cluerow.labels:
+            item.configure(bg=color or cluerow.defaultbg)
+        self.canvas.coords(cluerow.window, 0, self.offsets[row])
+        self.canvas.itemconfigure(cluerow.window, state=tk.NORMAL,
+                height=self.offsets[row + 1] - self.offsets[row])
+        self.bound[row] = cluerow
+
+    def on_rowclick(self, cluerow, event):
+        onclick = self.rows[cluerow.row][4]
+        if onclick is not None:
+            onclick(event)
+
+    def scroll_to(self, row):
+        '''Scrolls just enough to bring a clue row fully into view'''
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        if self.offsets[row] < top:
+            target = self.offsets[row]
+        elif self.offsets[row + 1] > top + height:
+            target = self.offsets[row + 1] - height
+        else:
+            return
+        self.canvas.yview_moveto(max(target, 0) / self.offsets[-1])
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+
+    def on_scroll(self, first, last):
+        self.vsb.set(first, last)
+        self.schedule()
+
+    def onCanvasConfigure(self, event):
+        '''Rebinds rows when the visible height changes'''
+        self.schedule()
 
 if __name__ == '__main__':
     root=tk.Tk()
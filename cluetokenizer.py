@@ -0,0 +1,48 @@
+import collections
+import re
+
+ClueRecord = collections.namedtuple('ClueRecord', 'num direction text length')
+
+TOKEN = re.compile(r'^(?P<header>Across|Down)$'
+        r'|(?P<num>[0-9]+) (?P<text>(?:(?!^(?:Across|Down)$).)*?)'
+        r'\((?P<length>[0-9]+)\)',
+        re.DOTALL | re.MULTILINE)
+ASTRAL = re.compile('[\U00010000-\U0010ffff]')
+
+def tokenize(page_text, errors=None):
+    '''Yields a ClueRecord per clue in one pass over the clue page.
+
+    Anything other than whitespace between clues once the Across header has
+    been seen is reported to errors as (offset, text)'''
+    direction = None
+    end = 0
+    for match in TOKEN.finditer(page_text):
+        if direction is not None and errors is not None:
+            skipped = page_text[end:match.start()]
+            if skipped.strip():
+                errors.append((end, skipped.strip()))
+        end = match.end()
+        if match['header']:
+            direction = match['header'][0]
+        elif direction is not None:
+            yield ClueRecord(int(match['num']), direction,
+                    match['text'].replace('\n', ' ').rstrip(' '),
+                    int(match['length']))
+    if direction is not None and errors is not None and page_text[end:].strip():
+        errors.append((end, page_text[end:].strip()))
+
+class Cleaner:
+    '''Replaces characters outside the Basic Multilingual Plane, which Tk
+    cannot show, using one str.translate table built from charmapping.
+    Characters not seen before get a numbered placeholder'''
+    def __init__(self, charmapping):
+        self.charmapping = charmapping
+        self.table = str.maketrans(charmapping)
+
+    def __call__(self, text):
+        if ASTRAL.search(text):
+            for char in ASTRAL.findall(text):
+                if char not in self.charmapping:
+                    self.charmapping[char] = f'[{len(self.charmapping) + 1}]'
+                    self.table[ord(char)] = self.charmapping[char]
+        return text.translate(self.table)
@@ -0,0 +1,148 @@
+import collections
+
+import candidates
+import cluecompiler
+
+# Clues with more candidates than this are only checked against their bounds
+EXACT_LIMIT = 5000
+
+def interval(style, refbounds):
+    '''Range a clue's answer must fall in given the bounds of what it refers
+    to, or None when the style says nothing about the range'''
+    if style == ('greater than', ''):
+        return refbounds[0][0] + 1, None
+    if style == ('less than', ''):
+        return None, refbounds[0][1] - 1
+    if len(refbounds) != 2:
+        return None
+    (low1, high1), (low2, high2) = refbounds
+    if style == ('sum of', 'and', ''):
+        return low1 + low2, high1 + high2
+    if style == ('product of', 'and', ''):
+        return low1 * low2, high1 * high2
+    if style == ('difference between', 'and', ''):
+        return max(0, low1 - high2, low2 - high1), max(high1 - low2, high2 - low1)
+    return None
+
+class ConsistencyChecker:
+    '''Flags clues that can no longer be answered, without rescanning the
+    board on every key press.
+
+    Every clue keeps cached bounds. When a cell changes only the clues
+    crossing it, and the clues referring to those, are checked again: first
+    against the bounds of the clues they refer to, then exactly when few
+    enough candidates are left. Solved clues sharing an answer are flagged
+    too. Flagged clues get Clue.iserror, which colors them in the ClueFrame.'''
+    def __init__(self, game):
+        self.game = game
+        self.graph = game.depgraph
+        self.checks = {}
+        self.styles = {}
+        for clueref, clue in game.clues_by_clueref.items():
+            self.styles[clueref] = cluecompiler.normalize(clue.cluestyle)
+            check = cluecompiler.compile_clue(clue.cluestyle, clue.refrences,
+                    clue.length)
+            if check is not None:
+                self.checks[clueref] = check
+        self.bounds = {}
+        self.answers = {}
+        self.by_answer = collections.defaultdict(set)
+        self.errors = {}
+        self.dirty = set(game.clues_by_clueref)
+
+    def cellchanged(self, xy):
+        '''Queues the clues a cell change can affect and checks them on
+        the next repaint'''
+        for clueref in self.graph.clues_by_xy.get(xy, ()):
+            self.dirty.add(clueref)
+            self.dirty.update(self.graph.dependents[clueref])
+        self.game.scheduler.mark(self)
+
+    def render(self, scheduler):
+        self.flush()
+
+    def flush(self):
+        '''Checks every queued clue. Returns the clues whose verdict changed'''
+        dirty, self.dirty = self.dirty, set()
+        answers = set()
+        for clueref in dirty:
+            answers.add(self.update(clueref))
+            answers.add(self.answers.get(clueref))
+        answers.discard(None)
+        for answer in answers:
+            dirty |= self.by_answer[answer]
+        changed = set()
+        for clueref in dirty:
+            reason = self.reason(clueref)
+            if reason != self.errors.get(clueref):
+                changed.add(clueref)
+                if reason is None:
+                    del self.errors[clueref]
+                else:
+                    self.errors[clueref] = reason
+        for clueref in changed:
+            self.game.clues_by_clueref[clueref].iserror = clueref in self.errors
+        return changed
+
+    def update(self, clueref):
+        '''Refreshes the cached bounds and answer of one clue.
+        Returns its previous answer'''
+        digitsets = self.game.clues_by_clueref[clueref].digitsets()
+        low = candidates.minimum(digitsets)
+        self.bounds[clueref] = None if low is None else (low,
+                candidates.maximum(digitsets))
+        answer = low if low is not None and low == self.bounds[clueref][1] else None
+        old = self.answers.pop(clueref, None)
+        if old is not None:
+            self.by_answer[old].discard(clueref)
+        if answer is not None:
+            self.answers[clueref] = answer
+            self.by_answer[answer].add(clueref)
+        return old
+
+    def reason(self, clueref):
+        '''Why the clue cannot be answered any more, or None'''
+        bounds = self.bounds[clueref]
+        if bounds is None:
+            return 'a cell has no hints left'
+        answer = self.answers.get(clueref)
+        if answer is not None and len(self.by_answer[answer]) > 1:
+            others = sorted(self.by_answer[answer] - {clueref})
+            return f'same answer as {", ".join(f"{n}{d}" for n, d in others)}'
+
+        check = self.checks.get(clueref)
+        if check is None:
+            return None
+        refbounds = []
+        for ref in check.refs:
+            if not isinstance(ref, tuple):
+                refbounds.append((ref, ref))
+            elif self.bounds.get(ref) is not None:
+                refbounds.append(self.bounds[ref])
+            else:
+                break
+        else:
+            limits = interval(self.styles[clueref], refbounds)
+            if limits is not None:
+                low, high = limits
+                if (low is not None and bounds[1] < low
+                        or high is not None and bounds[0] > high):
+                    return 'out of range of the clues it refers to'
+
+        digitsets = self.game.clues_by_clueref[clueref].digitsets()
+        if candidates.count(digitsets) > EXACT_LIMIT:
+            return None
+        numbers = list(candidates.iterate(digitsets))
+        if not len(check(numbers, self)):
+            return 'no remaining number fits the clue'
+        return None
+
+    def values(self, clueref):
+        '''Lookup for CompiledClue: a referenced clue's candidates when there
+        are some but not too many of them'''
+        if clueref not in self.game.clues_by_clueref:
+            return None
+        digitsets = self.game.clues_by_clueref[clueref].digitsets()
+        if not 0 < candidates.count(digitsets) <= EXACT_LIMIT:
+            return None
+        return list(candidates.iterate(digitsets))
@@ -0,0 +1,93 @@
+import collections
+
+class DependencyGraph:
+    '''Tracks which clues need re-checking when cells change.
+
+    A clue depends on its own cells and on every clue its text refers to,
+    so a change to a cell dirties the clues crossing it and everything
+    downstream of those through the references.'''
+    def __init__(self, clue_cells, clue_refs):
+        self.clue_cells = {clueref: tuple(cells)
+                for clueref, cells in clue_cells.items()}
+
+        self.clues_by_xy = collections.defaultdict(list)
+        for clueref, cells in self.clue_cells.items():
+            for xy in cells:
+                self.clues_by_xy[xy].append(clueref)
+
+        self.dependents = collections.defaultdict(list)
+        for clueref, refs in clue_refs.items():
+            for ref in refs:
+                if ref in self.clue_cells and ref != clueref:
+                    self.dependents[ref].append(clueref)
+
+        self.rank = self.__rank()
+        self.downstream = {clueref: self.__reach(clueref)
+                for clueref in self.clue_cells}
+
+        self.dirty = set(self.clue_cells)
+
+    @classmethod
+    def from_game(cls, game):
+        clue_cells = {clueref: [(cell.x, cell.y) for cell in clue.cells]
+                for clueref, clue in game.clues_by_clueref.items()}
+        clue_refs = {clueref: [clue.getref(ref) for ref in clue.refrenceclues]
+                for clueref, clue in game.clues_by_clueref.items()}
+        return cls(clue_cells, clue_refs)
+
+    def __rank(self):
+        '''Topological depth, referenced clues before the clues using them.
+        Clues caught in a reference cycle go last'''
+        indegree = collections.Counter()
+        for dependents in self.dependents.values():
+            indegree.update(dependents)
+        queue = collections.deque(clueref for clueref in self.clue_cells
+                if not indegree[clueref])
+        rank = dict.fromkeys(queue, 0)
+        while queue:
+            clueref = queue.popleft()
+            for dependent in self.dependents[clueref]:
+                indegree[dependent] -= 1
+                if not indegree[dependent]:
+                    rank[dependent] = rank[clueref] + 1
+                    queue.append(dependent)
+        last = max(rank.values(), default=0) + 1
+        for clueref in self.clue_cells:
+            rank.setdefault(clueref, last)
+        return rank
+
+    def __reach(self, clueref):
+        seen = {clueref}
+        stack = [clueref]
+        while stack:
+            for dependent in self.dependents[stack.pop()]:
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return tuple(sorted(seen, key=self.rank.get))
+
+    def affected(self, xy):
+        '''Every clue a change to the cell at xy can invalidate'''
+        output = set()
+        for clueref in self.clues_by_xy[xy]:
+            output.update(self.downstream[clueref])
+        return output
+
+    def mark_cell(self, xy):
+        for clueref in self.clues_by_xy[xy]:
+            self.mark_clue(clueref)
+
+    def mark_clue(self, clueref):
+        for dependent in self.downstream[clueref]:
+            self.dirty.add(dependent)
+
+    def pop_dirty(self, priority=None):
+        '''Returns the dirty clues in topological order and clears them.
+        Ties are broken by priority(clueref), lowest first'''
+        if priority is None:
+            key = lambda clueref: (self.rank[clueref], clueref)
+        else:
+            key = lambda clueref: (self.rank[clueref], priority(clueref), clueref)
+        output = sorted(self.dirty, key=key)
+        self.dirty.clear()
+        return output
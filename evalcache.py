@@ -0,0 +1,46 @@
+import collections
+
+class EvalCache:
+    '''Bounded LRU memo of clue revisions.
+
+    Keys are (clue key, masks of the clue's cells, masks of the cells of every
+    clue it references), which is everything a revision depends on, so clues
+    sharing a style share entries and search revisiting a sub-state gets the
+    supported digits back without enumerating candidates again.'''
+    def __init__(self, maxsize=200000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __reduce__(self):
+        # Worker processes start with an empty cache of the same size
+        return (EvalCache, (self.maxsize,))
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0
+        return (f'{len(self.entries)} entries, {self.hits} hits, '
+                f'{self.misses} misses ({rate:.0%} hit rate)')
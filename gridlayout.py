@@ -0,0 +1,45 @@
+import collections
+
+import numpy as np
+
+# Accept a pitch when every point sits this close to a grid line,
+# measured as a fraction of a cell
+TOLERANCE = 0.1
+MIN_CONFIDENCE = 0.7
+
+class Axis(collections.namedtuple('Axis', 'origin pitch confidence')):
+    '''Grid lines along one axis sit at origin + n*pitch'''
+    def indices(self, coords):
+        if not self.pitch:
+            return np.zeros(len(coords), dtype=int)
+        return np.rint((np.asarray(coords, dtype=float) - self.origin)
+                / self.pitch).astype(int)
+
+def infer_axis(coords, max_cells=1000):
+    '''Recovers an axis' pitch and origin from noisy anchor coordinates.
+
+    The span between the outermost anchors is a whole number of cells, so
+    every cell count up to max_cells is scored by its worst residual over
+    all coordinates in one array operation. The fewest cells that fit every
+    point wins and is refined by least squares. A single anchor between
+    grid lines rules a count out, where an average would let a grid of
+    twice the pitch through. Confidence is 1 when every point lands on a
+    grid line and 0 when the worst one is half a cell off'''
+    coords = np.asarray(coords, dtype=float)
+    low = coords.min()
+    span = coords.max() - low
+    if span == 0:
+        return Axis(low, 0.0, 1.0)
+
+    counts = np.arange(1, max_cells + 1)
+    offsets = (coords[None, :] - low) * counts[:, None] / span
+    error = np.abs(offsets - np.rint(offsets)).max(axis=1)
+    fits = np.flatnonzero(error < TOLERANCE)
+    best = fits[0] if len(fits) else np.argmin(error)
+
+    cells = np.rint(offsets[best])
+    design = np.stack([np.ones_like(cells), cells], axis=1)
+    (origin, pitch), *_ = np.linalg.lstsq(design, coords, rcond=None)
+    offsets = (coords - origin) / pitch
+    error = np.abs(offsets - np.rint(offsets)).max()
+    return Axis(origin, pitch, max(0.0, 1 - 2*error))
@@ -0,0 +1,42 @@
+import concurrent.futures
+import threading
+
+import boardstate
+
+def next_deduction(propagator, cancel=None):
+    '''The cheapest single deduction: tries clues with the fewest candidates
+    first and stops at the first one that rules anything out.
+
+    Returns (clueref, xy, digits) for a cell of that clue and the digits the
+    clue rules out there, or None if no clue rules anything out or the
+    search was cancelled'''
+    order = sorted(propagator.checks, key=lambda clueref:
+            (propagator.count(clueref), clueref))
+    for clueref in order:
+        if cancel is not None and cancel.is_set():
+            return None
+        removed = propagator.eliminations(clueref)
+        if removed:
+            cellid = min(removed, key=lambda cellid:
+                    (-int(boardstate.POPCOUNT[removed[cellid]]), cellid))
+            return (clueref, propagator.state.xy_by_id[cellid],
+                    boardstate.DIGITSETS[removed[cellid]])
+    return None
+
+class HintSearch:
+    '''next_deduction running on a background thread against a propagator,
+    which already holds its own copy of the board's hints'''
+    def __init__(self, propagator):
+        self.cancel = threading.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.future = executor.submit(next_deduction, propagator, self.cancel)
+        executor.shutdown(wait=False)
+
+    def stop(self):
+        self.cancel.set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
@@ -0,0 +1,118 @@
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+
+SNAPSHOT = struct.Struct('<4sII')
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<IH')
+
+class Journal:
+    '''Autosave that appends every hint change to {path}.journal from a
+    background thread, so the Tk loop never waits on the disk.
+
+    Every so often the whole board is written to {path}.autosave and the
+    journal starts over. Both files carry a generation number, so a crash
+    between the two writes never replays records the snapshot already has.
+    Generations carry on from the autosave already on disk, so records left
+    from an earlier session never match a new snapshot either.'''
+    def __init__(self, path, state, compact_every=5000):
+        self.path = path
+        self.state = state
+        self.compact_every = compact_every
+        self.generation = last_generation(path)
+        self.count = 0
+        self.started = False
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+
+    def record(self, cellid, mask):
+        '''Queues one hint change. The first change after starting writes a
+        full snapshot instead'''
+        if not self.started or self.count >= self.compact_every:
+            self.compact()
+        else:
+            self.queue.put(RECORD.pack(cellid, mask))
+            self.count += 1
+
+    def compact(self):
+        '''Queues a snapshot of the current board and a fresh journal'''
+        self.generation += 1
+        self.queue.put((self.generation, self.state.snapshot()))
+        self.count = 0
+        self.started = True
+
+    def flush(self):
+        '''Waits until everything queued so far is on disk'''
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def writer(self):
+        journal = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                if journal is not None:
+                    journal.close()
+                self.queue.task_done()
+                return
+            if isinstance(item, tuple):
+                if journal is not None:
+                    journal.close()
+                journal = self.write_snapshot(*item)
+            elif journal is not None:
+                journal.write(item)
+            if journal is not None and self.queue.empty():
+                journal.flush()
+            self.queue.task_done()
+
+    def write_snapshot(self, generation, snapshot):
+        '''Replaces the autosave, then opens a new journal to append to'''
+        with open(self.path + '.autosave.tmp', 'wb') as f:
+            f.write(SNAPSHOT.pack(b'XSN1', generation, len(snapshot) // 2))
+            f.write(snapshot)
+        os.replace(self.path + '.autosave.tmp', self.path + '.autosave')
+        journal = open(self.path + '.journal', 'wb')
+        journal.write(HEADER.pack(b'XJN1', generation))
+        return journal
+
+def last_generation(path):
+    '''Generation of the autosave at path, or 0 if there is none'''
+    try:
+        with open(path + '.autosave', 'rb') as f:
+            magic, generation, cells = SNAPSHOT.unpack(f.read(SNAPSHOT.size))
+    except (OSError, struct.error):
+        return 0
+    return generation if magic == b'XSN1' else 0
+
+def recover(path, size):
+    '''Rebuilds the last autosaved board for a board of size cells.
+    Returns (snapshot bytes, modification time) or None'''
+    try:
+        with open(path + '.autosave', 'rb') as f:
+            magic, generation, cells = SNAPSHOT.unpack(f.read(SNAPSHOT.size))
+            masks = np.frombuffer(f.read(), dtype=np.uint16).copy()
+        mtime = os.path.getmtime(path + '.autosave')
+    except (OSError, struct.error):
+        return None
+    if magic != b'XSN1' or cells != size or len(masks) != size:
+        return None
+
+    try:
+        with open(path + '.journal', 'rb') as f:
+            data = f.read()
+        mtime = os.path.getmtime(path + '.journal')
+    except OSError:
+        data = b''
+    if len(data) >= HEADER.size and HEADER.unpack_from(data) == (b'XJN1', generation):
+        end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+        for cellid, mask in RECORD.iter_unpack(data[HEADER.size:end]):
+            if cellid < size:
+                masks[cellid] ^= mask
+    return masks.tobytes(), mtime
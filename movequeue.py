@@ -1,29 +1,117 @@
+import array
+import struct
+
+class Fork:
+    '''A branch point: the guess made, the move log position it was made at,
+    and the board snapshot to go back to'''
+    def __init__(self, position, cellid, digit, snapshot, parent=None):
+        self.position = position
+        self.cellid = cellid
+        self.digit = digit
+        self.snapshot = snapshot
+        self.parent = parent
+
 class MoveQueue:
+    '''Log of hint toggles stored as (cell id, XOR mask) pairs.
+
+    A move undoes itself, so undo and redo are one mask application each.
+    Forks remember a board snapshot, so reverting one never replays moves.'''
+    HEADER = struct.Struct('<4sIII')
+    FORK = struct.Struct('<IIBI')
+
     def __init__(self):
-        self._queue = []
+        self._cells = array.array('I')
+        self._masks = array.array('H')
+        self._position = 0
+        self._fork = None
 
-    def add(self, x, y, toggle):
-        self._queue.append((x, y, tuple(toggle)))
+    def __len__(self):
+        return self._position
+
+    def add(self, cellid, mask):
+        '''Records a move, dropping anything that could have been redone'''
+        del self._cells[self._position:]
+        del self._masks[self._position:]
+        self._cells.append(cellid)
+        self._masks.append(mask)
+        self._position += 1
 
     def undo(self):
-        if self._queue:
-            return self._queue.pop()
-        else:
-            pass #TODO
+        '''Returns the (cell id, mask) to apply, never reaching back past the
+        current fork, or None if there is nothing to undo'''
+        floor = self._fork.position if self._fork else 0
+        if self._position <= floor:
+            return None
+        self._position -= 1
+        return self._cells[self._position], self._masks[self._position]
 
-    def save(self):
-        pass
-        return dic
+    def next(self):
+        '''Redoes the next undone move. Returns the (cell id, mask) to apply,
+        or None if there is nothing to redo'''
+        if self._position == len(self._cells):
+            return None
+        self._position += 1
+        return self._cells[self._position - 1], self._masks[self._position - 1]
 
-    def load(self):
-        pass
-        return self
+    def fork(self, cellid, digit, snapshot):
+        '''Starts a branch that guesses digit for the cell. snapshot is the
+        board as it was just before the guess'''
+        del self._cells[self._position:]
+        del self._masks[self._position:]
+        self._fork = Fork(self._position, cellid, digit, snapshot, self._fork)
 
-    def fail(self):
-        pass
+    def forks(self):
+        '''The open forks, innermost first'''
+        fork = self._fork
+        while fork is not None:
+            yield fork
+            fork = fork.parent
 
     def revert(self):
-        pass
+        '''Drops the current fork and every move made in it.
+        Returns the fork, whose snapshot the board should go back to,
+        or None if there is no fork'''
+        fork = self._fork
+        if fork is None:
+            return None
+        del self._cells[fork.position:]
+        del self._masks[fork.position:]
+        self._position = fork.position
+        self._fork = fork.parent
+        return fork
 
-    def next(self):
-        pass
+    def fail(self):
+        '''Abandons the current fork because its guess was wrong'''
+        return self.revert()
+
+    def save(self):
+        '''Packs the log and its forks, outermost first, into bytes'''
+        forks = list(self.forks())[::-1]
+        output = [self.HEADER.pack(b'XMQ1', len(self._cells), self._position,
+                len(forks)), self._cells.tobytes(), self._masks.tobytes()]
+        for fork in forks:
+            output.append(self.FORK.pack(fork.position, fork.cellid, fork.digit,
+                    len(fork.snapshot)))
+            output.append(fork.snapshot)
+        return b''.join(output)
+
+    def load(self, data):
+        '''Replaces the log with one packed by save'''
+        magic, count, position, forkcount = self.HEADER.unpack_from(data)
+        if magic != b'XMQ1':
+            raise ValueError('Not a move log')
+        offset = self.HEADER.size
+        self._cells = array.array('I')
+        self._masks = array.array('H')
+        for log in (self._cells, self._masks):
+            log.frombytes(data[offset:offset + log.itemsize*count])
+            offset += log.itemsize*count
+        self._position = position
+        self._fork = None
+        for _ in range(forkcount):
+            forkposition, cellid, digit, size = self.FORK.unpack_from(data, offset)
+            offset += self.FORK.size
+            self._fork = Fork(forkposition, cellid, digit,
+                    bytes(data[offset:offset + size]), self._fork)
+            offset += size
+        return self
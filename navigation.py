@@ -0,0 +1,65 @@
+import bisect
+
+DIRECTIONS = {'Up': (0, -1), 'Down': (0, 1), 'Left': (-1, 0), 'Right': (1, 0)}
+
+class NavigationIndex:
+    '''Lookup tables for keyboard movement, built once per board.
+
+    step[direction][cell] is the neighbouring cell and end[direction][cell]
+    the last cell of the run in that direction, or None at the edge. Clues
+    are kept in list order, and the unsolved cells as a sorted list of
+    reading order positions that hint changes keep up to date.'''
+    def __init__(self, cells, clues):
+        cell_by_xy = {(cell.x, cell.y): cell for cell in cells}
+        self.step = {}
+        self.end = {}
+        for direction, (dx, dy) in DIRECTIONS.items():
+            step = {cell: cell_by_xy.get((cell.x + dx, cell.y + dy))
+                    for cell in cell_by_xy.values()}
+            end = {}
+            # Cells furthest along the direction first, so a neighbour's
+            # run end is always known
+            for cell in sorted(step, key=lambda cell: -(cell.x*dx + cell.y*dy)):
+                neighbour = step[cell]
+                end[cell] = None if neighbour is None else end[neighbour] or neighbour
+            self.step[direction] = step
+            self.end[direction] = end
+
+        self.clues = sorted(clues, key=lambda clue: (clue.clueref[1], clue.clueref[0]))
+        self.clue_position = {clue: i for i, clue in enumerate(self.clues)}
+        self.cells = sorted(cell_by_xy.values(), key=lambda cell: (cell.y, cell.x))
+        self.cell_position = {cell: i for i, cell in enumerate(self.cells)}
+        self.unsolved = [i for i, cell in enumerate(self.cells)
+                if len(cell.availablehints) != 1]
+
+    def cellchanged(self, cell):
+        '''Keeps the unsolved cells current after a cell's hints change'''
+        position = self.cell_position[cell]
+        index = bisect.bisect_left(self.unsolved, position)
+        listed = index < len(self.unsolved) and self.unsolved[index] == position
+        if len(cell.availablehints) == 1:
+            if listed:
+                del self.unsolved[index]
+        elif not listed:
+            self.unsolved.insert(index, position)
+
+    def nextclue(self, clue, step=1):
+        '''The clue after this one in list order, wrapping from the last
+        Down clue to the first Across one. step=-1 goes backwards'''
+        if clue is None:
+            return self.clues[0 if step > 0 else -1] if self.clues else None
+        return self.clues[(self.clue_position[clue] + step) % len(self.clues)]
+
+    def nextunsolved(self, cell, step=1):
+        '''The next unsolved cell in reading order, wrapping around, or None
+        if every cell is solved. step=-1 goes backwards'''
+        if not self.unsolved:
+            return None
+        position = -1 if cell is None else self.cell_position[cell]
+        if step > 0:
+            index = bisect.bisect_right(self.unsolved, position) % len(self.unsolved)
+        else:
+            if cell is None:
+                position = len(self.cells)
+            index = bisect.bisect_left(self.unsolved, position) - 1
+        return self.cells[self.unsolved[index]]
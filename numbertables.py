@@ -0,0 +1,122 @@
+import math
+import os
+import tempfile
+
+import numpy as np
+
+# Longer numbers fall back to computing the property directly
+MAX_LENGTH = 8
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.crosstables')
+SEGMENT = 1 << 23
+
+_tables = {}
+
+def primes_upto(limit):
+    sieve = np.ones(limit + 1, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p*p::p] = False
+    return np.flatnonzero(sieve)
+
+def prime_segment(start, stop):
+    '''Segmented sieve over start <= n < stop'''
+    segment = np.ones(stop - start, dtype=bool)
+    for p in primes_upto(math.isqrt(stop - 1)).tolist():
+        first = max(p*p, -(-start // p) * p)
+        segment[first - start::p] = False
+    segment[:max(2 - start, 0)] = False
+    return segment
+
+def sequence_segment(values):
+    '''Builder marking the members of an increasing sequence'''
+    def segment(start, stop):
+        output = np.zeros(stop - start, dtype=bool)
+        for value in values():
+            if value >= stop:
+                break
+            if value >= start:
+                output[value - start] = True
+        return output
+    return segment
+
+def powers(exponent):
+    def values():
+        root = 1
+        while True:
+            yield root**exponent
+            root += 1
+    return values
+
+def triangulars():
+    n = 1
+    while True:
+        yield n*(n + 1) // 2
+        n += 1
+
+def fibonaccis():
+    a, b = 1, 2
+    while True:
+        yield a
+        a, b = b, a + b
+
+BUILDERS = {
+    'prime': prime_segment,
+    'square': sequence_segment(powers(2)),
+    'cube': sequence_segment(powers(3)),
+    'triangular': sequence_segment(triangulars),
+    'fibonacci': sequence_segment(fibonaccis),
+}
+
+def build(name, length, path):
+    '''Sieves every length-digit number once and writes the packed bits.
+    Each build writes its own temporary file, so processes building the
+    same table at once never interleave. The table is left readable by
+    everyone, like any other shared cache file'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    low, high = 10**(length - 1), 10**length
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for start in range(low, high, SEGMENT):
+                f.write(np.packbits(BUILDERS[name](start, min(start + SEGMENT, high))))
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+def table(name, length):
+    '''Read-only memory-mapped bitset of the property for length-digit
+    numbers, or None if it can be neither read nor built'''
+    key = (name, length)
+    if key not in _tables:
+        path = os.path.join(TABLE_DIR, f'{name}{length}.bits')
+        try:
+            if not os.path.exists(path):
+                build(name, length, path)
+            _tables[key] = np.memmap(path, dtype=np.uint8, mode='r')
+        except OSError as e:
+            print(f'No {name} table for length {length}: {e}')
+            _tables[key] = None
+    return _tables[key]
+
+def covers(name, numbers, length):
+    '''Whether the tables can answer for every one of numbers. When the
+    table cannot be built, callers compute the property directly'''
+    return (length <= MAX_LENGTH and len(numbers) > 0
+            and numbers.min() >= 10**(length - 1) and numbers.max() < 10**length
+            and table(name, length) is not None)
+
+def mask(name, numbers, length):
+    '''Vectorized lookup for an array of length-digit numbers'''
+    index = numbers - 10**(length - 1)
+    return (table(name, length)[index >> 3] >> (7 - (index & 7)) & 1).astype(bool)
+
+def lookup(name, number):
+    '''O(1) lookup for a single number'''
+    length = len(str(number))
+    if number < 1 or length > MAX_LENGTH or table(name, length) is None:
+        raise ValueError(f'No table for {number}')
+    index = number - 10**(length - 1)
+    return bool(table(name, length)[index >> 3] >> (7 - (index & 7)) & 1)
@@ -0,0 +1,59 @@
+import cluetokenizer
+import gridlayout
+import stats
+
+def parse(filename):
+    '''Reads the clue anchors and clue text out of a crossnumber PDF.
+    Returns the plain data Game.build needs'''
+    import fitz
+    with stats.phase('pdf open'):
+        doc = fitz.open(filename)
+    with stats.phase('raw clue locations'):
+        raw_clue_locations = get_raw_clue_locations(doc)
+    with stats.phase('clue page text'):
+        raw_clue_text = doc.getPageText(1)
+    doc.close()
+
+    with stats.phase('clue locations'):
+        anchors = process_clue_locations(raw_clue_locations)
+    with stats.phase('clue text'):
+        clues = process_clue_text(raw_clue_text)
+    return {'anchors': anchors, 'clues': clues}
+
+def get_raw_clue_locations(doc):
+    raw_clue_locations = []
+    clue_check = 0
+    for block in doc[0].getText('dict')['blocks']:
+        if 'lines' not in block:
+            continue
+        for line in block['lines']:
+            for span in line['spans']:
+                if span['flags'] == 4  and span['text'].isnumeric():
+                    clue_check += 1
+                    if str(clue_check) != span['text']:
+                        print(f'Clue mismatch {span["text"]}.  Expecting {clue_check}.')
+                        raise SyntaxError
+                    raw_clue_locations.append((int(span['text']), span['bbox'][0], span['bbox'][1]))
+    return raw_clue_locations
+
+def infer_axis(coords, label):
+    axis = gridlayout.infer_axis(coords)
+    if axis.confidence < gridlayout.MIN_CONFIDENCE:
+        print(f'No {label} offset found (confidence {axis.confidence:.2f})')
+        raise SyntaxError
+    return axis
+
+def process_clue_locations(raw_clue_locations):
+    width = infer_axis([x[1] for x in raw_clue_locations], 'width')
+    height = infer_axis([x[2] for x in raw_clue_locations], 'height')
+    columns = width.indices([x[1] for x in raw_clue_locations])
+    rows = height.indices([x[2] for x in raw_clue_locations])
+    return [(clue, int(column), int(row)) for (clue, w, h), column, row
+            in zip(raw_clue_locations, columns, rows)]
+
+def process_clue_text(raw_clue_text):
+    errors = []
+    clues = list(cluetokenizer.tokenize(raw_clue_text, errors))
+    for offset, text in errors:
+        print(f'Malformed clue at offset {offset}: {text!r}')
+    return clues
@@ -0,0 +1,152 @@
+import heapq
+import math
+
+import numpy as np
+
+import boardstate
+import evalcache
+
+# Sorted digits of every mask, for building candidate arrays
+DIGITS = tuple(np.array(sorted(digits), dtype=np.int64)
+        for digits in boardstate.DIGITSETS)
+
+class Propagator:
+    '''Narrows cell hints against clue checks without touching the canvas.
+
+    Works on its own copy of a BoardState's masks so it can run headless,
+    and a search branch costs one array copy. Only pushes the result back
+    to the cells once everything has settled.
+    Checks with a key attribute have their revisions memoized in cache.'''
+    def __init__(self, state, graph, checks=None, limit=200000, cache=None):
+        self.state = state.copy()
+        self.masks = self.state.masks
+        self.clue_ids = self.state.clue_cells
+        self.graph = graph
+        self.clue_cells = graph.clue_cells
+        self.checks = checks or {}
+        self.limit = limit
+        self.cache = evalcache.EvalCache() if cache is None else cache
+        self.failed = None
+
+    @classmethod
+    def from_game(cls, game, checks=None, **kwargs):
+        return cls(game.state, game.depgraph, checks, **kwargs)
+
+    @property
+    def hints(self):
+        '''Every cell's hints by xy'''
+        return {xy: boardstate.DIGITSETS[mask] for xy, mask
+                in zip(self.state.xy_by_id, self.masks[:self.state.size].tolist())}
+
+    def cellhints(self, xy):
+        return boardstate.DIGITSETS[self.masks[self.state.id_by_xy[xy]]]
+
+    def fix(self, xy, digit):
+        '''Leaves digit as the only hint of the cell at xy'''
+        self.masks[self.state.id_by_xy[xy]] = 1 << digit
+
+    def clue_masks(self, clueref):
+        return tuple(self.masks[self.clue_ids[clueref]].tolist())
+
+    def digitsets(self, clueref):
+        return [boardstate.DIGITSETS[mask] for mask in self.clue_masks(clueref)]
+
+    def count(self, clueref):
+        return math.prod(boardstate.POPCOUNT[self.masks[self.clue_ids[clueref]]].tolist())
+
+    def values(self, clueref):
+        '''Numbers the clue's cells still allow as an ascending array, or None
+        if there are too many or the clue is not on the board. Built with
+        one outer sum per cell'''
+        if clueref not in self.clue_ids or self.count(clueref) > self.limit:
+            return None
+        numbers = np.zeros(1, dtype=np.int64)
+        masks = self.clue_masks(clueref)
+        for power, mask in zip(10 ** np.arange(len(masks) - 1, -1, -1), masks):
+            numbers = np.add.outer(numbers, DIGITS[mask] * power).ravel()
+        return numbers
+
+    def cachekey(self, clueref, check):
+        '''Everything the check's verdict on this clue depends on, or None
+        if the check cannot be memoized'''
+        key = getattr(check, 'key', None)
+        if key is None:
+            return None
+        refmasks = tuple(self.clue_masks(ref) for ref in check.refs
+                if ref in self.clue_ids)
+        return key, self.clue_masks(clueref), refmasks
+
+    def supported(self, clueref, check):
+        '''Mask of the digits each of the clue's cells can still take, or
+        None if there are too many candidates to check'''
+        numbers = self.values(clueref)
+        if numbers is None:
+            return None
+        length = len(self.clue_ids[clueref])
+        passed = np.asarray(check(numbers, self), dtype=np.int64)
+        if not len(passed):
+            return (0,) * length
+        powers = 10 ** np.arange(length - 1, -1, -1, dtype=np.int64)
+        bits = np.left_shift(1, passed[:, None] // powers % 10)
+        return tuple(np.bitwise_or.reduce(bits, axis=0).tolist())
+
+    def eliminations(self, clueref):
+        '''Masks of the hints that no number passing the clue's check uses,
+        by cell id, without removing them'''
+        check = self.checks.get(clueref)
+        if check is None:
+            return {}
+        key = self.cachekey(clueref, check)
+        supported = None if key is None else self.cache.get(key)
+        if supported is None:
+            supported = self.supported(clueref, check)
+            if supported is None:
+                return {}
+            if key is not None:
+                self.cache.put(key, supported)
+
+        cellids = self.clue_ids[clueref].tolist()
+        return {cellid: mask & ~allowed for cellid, mask, allowed
+                in zip(cellids, self.clue_masks(clueref), supported)
+                if mask & ~allowed}
+
+    def revise(self, clueref):
+        '''Drops hints that no number passing the clue's check uses.
+        Returns the ids of the cells that changed'''
+        removed = self.eliminations(clueref)
+        for cellid, mask in removed.items():
+            self.masks[cellid] ^= mask
+        return list(removed)
+
+    def run(self, clues=None):
+        '''Revises clues until nothing changes, referenced clues first and
+        then the ones with fewest candidates. Only clues downstream of a
+        changed cell are revisited. Returns False if a cell runs out of hints'''
+        heap = []
+        queued = set()
+        def push(clueref):
+            if clueref not in queued:
+                queued.add(clueref)
+                heapq.heappush(heap,
+                        (self.graph.rank[clueref], self.count(clueref), clueref))
+
+        for clueref in self.clue_cells if clues is None else clues:
+            push(clueref)
+        while heap:
+            clueref = heapq.heappop(heap)[-1]
+            queued.discard(clueref)
+            for cellid in self.revise(clueref):
+                xy = self.state.xy_by_id[cellid]
+                if not self.masks[cellid]:
+                    self.failed = xy
+                    return False
+                for other in self.graph.affected(xy):
+                    if other != clueref:
+                        push(other)
+        return True
+
+    def apply(self, game):
+        '''Pushes the narrowed hints back to the board in one pass'''
+        cellids, toggles = game.state.diff(self.state)
+        for cellid, toggle in zip(cellids.tolist(), toggles.tolist()):
+            game.cell_by_id[cellid].togglemask(toggle)
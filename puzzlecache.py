@@ -0,0 +1,31 @@
+import hashlib
+import json
+import os
+
+# Bump whenever pdfparse changes what it produces
+CACHE_VERSION = 1
+CACHE_DIR = '.crosscache'
+
+def cache_path(filename, digest):
+    folder = os.path.join(os.path.dirname(filename), CACHE_DIR)
+    return os.path.join(folder, f'{digest}.v{CACHE_VERSION}.json')
+
+def load(filename):
+    '''Parsed puzzle data for a PDF, from the cache when the same file
+    content was parsed before. PyMuPDF is only imported on a cache miss'''
+    with open(filename, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    path = cache_path(filename, digest)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    import pdfparse
+    data = pdfparse.parse(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+    return data
@@ -1,14 +1,37 @@
-import re
+import time
+# Taken before the other imports so the startup report includes them
+STARTED = time.perf_counter()
+
+import argparse
 import json
+import os
+import math
 import collections
+import random
+import sys
 import tkinter as tk
-import tkinter.font as tkfont
-import ctypes
-
-import fitz
+from tkinter import messagebox
 
+import boardrender
+import candidates
 import clueframe
+import cluetokenizer
+import depgraph
+import evalcache
 import movequeue
+import navigation
+import puzzlecache
+import stats
+
+def loadmodel():
+    '''Imports the modules that pull in numpy, which is most of the import
+    time. The window defers them until it has painted; building a board
+    calls this first'''
+    global boardstate, cluecompiler, consistency, journal, propagate
+    import boardstate, cluecompiler, consistency, journal, propagate
+
+# How long Start Fork searches before giving up
+SOLVE_SECONDS = 120
 
 #Todo:
 # Striping clues (white/gray/white/etc)
@@ -18,7 +41,6 @@ import movequeue
 # Consistent row mode/column mode
 # Load not found error
 # Click clues
-# Scroll clues to display new highlighted clue
 # Load file from open application
 # Check to make sure it opens without specified number
 # Remove dummy
@@ -45,55 +67,24 @@ class Cell:
 
         self.x = x
         self.y = y
+        self.text = text
+        if ishead:
+            self.id = self.game.state.add_cell(x, y, boardstate.ALL & ~1)
+        else:
+            self.id = self.game.state.add_cell(x, y)
         self.clues = []
 
-        helv1 = tkfont.Font(family='Helvetica', size=7, weight='bold')
-        helv2 = tkfont.Font(family='Helvetica', size=6)
-        helv3 = tkfont.Font(family='Helvetica', size=18)
-
-        xpixel = self.game.xoff + x*self.game.cellsize
-        ypixel = self.game.yoff + y*self.game.cellsize
-        self.rect = self.game.board.create_rectangle(
-                xpixel,
-                ypixel,
-                xpixel + self.game.cellsize,
-                ypixel + self.game.cellsize,
-                fill=Colors.foreground)
-        if text:
-            self.game.board.create_text(
-                xpixel + 1,
-                ypixel - 1,
-                anchor=tk.NW,
-                text=text,
-                font=helv1,
-                state=tk.DISABLED)
-        self.game.board.tag_bind(self.rect, '<Button-1>', self.on_click)
-        self.game.board.tag_bind(self.rect, '<Enter>', self.on_enter)
-        self.game.board.tag_bind(self.rect, '<Leave>', self.on_leave)
-
+        self.rect = None
         self.digitlist = []
-        self.availablehints = set()
-        for digit in range(10):
-            div, mod = divmod(digit+2, 3)
-            xt = xpixel + 9 + mod*8
-            yt = ypixel + 5 + div*8
-
-            digitid = self.game.board.create_text(xt, yt, text=digit,
-                    font=helv2, state=tk.DISABLED, disabledfill=Colors.hints)
-            self.digitlist.append(digitid)
-            self.availablehints.add(digit)
-        if self.ishead:
-            self.togglehint((0,))
-
-        self.bigone = self.game.board.create_text(
-                xpixel + self.game.cellsize/2,
-                ypixel + self.game.cellsize/2,
-                text = '', font=helv3, state=tk.HIDDEN,
-                disabledfill=Colors.hints)
+        self.bigone = None
 
     def __str__(self):
         return f'Cell at ({self.x}, {self.y})'
 
+    @property
+    def availablehints(self):
+        return self.game.state.hints(self.id)
+
     @property
     def iserror(self):
         return self._iserror
@@ -130,42 +121,63 @@ class Cell:
         self._mouseover = value
         self.updatecolor()
 
-    def updatecolor(self):
+    @property
+    def color(self):
         if self.iserror:
-            self.game.board.itemconfigure(self.rect, fill=Colors.error)
+            return Colors.error
         elif self.isselected:
-            self.game.board.itemconfigure(self.rect, fill=Colors.selected)
-            self.game.selectionColoredCells.append(self)
+            return Colors.selected
         elif self.mouseover:
-            self.game.board.itemconfigure(self.rect, fill=Colors.mouseover)
+            return Colors.mouseover
         elif self.isrowselected:
-            self.game.board.itemconfigure(self.rect, fill=Colors.rowselected)
-            self.game.selectionColoredCells.append(self)
+            return Colors.rowselected
         else:
-            self.game.board.itemconfigure(self.rect, fill=Colors.foreground)
+            return Colors.foreground
+
+    def highlight(self, isselected, isrowselected):
+        self._isselected = isselected
+        self._isrowselected = isrowselected
+        self.updatecolor()
+
+    def updatecolor(self):
+        self.game.scheduler.mark(self)
+
+    def render(self, scheduler):
+        '''Brings the canvas items in line with the cell's current state'''
+        board = self.game.board
+        scheduler.itemconfigure(board, self.rect, fill=self.color)
+        hints = self.availablehints
+        for digit, item in enumerate(self.digitlist):
+            if digit in hints and len(hints) > 1:
+                scheduler.itemconfigure(board, item, state=tk.DISABLED)
+            else:
+                scheduler.itemconfigure(board, item, state=tk.HIDDEN)
+        if len(hints) == 1:
+            (remaining,) = hints
+            scheduler.itemconfigure(board, self.bigone, text=remaining,
+                    state=tk.DISABLED)
+        else:
+            scheduler.itemconfigure(board, self.bigone, state=tk.HIDDEN)
 
     def togglehint(self, numlist):
-        if len(self.availablehints) == 1:
-            (remaining,) = self.availablehints
-            self.game.board.itemconfigure(self.digitlist[remaining], state=tk.DISABLED)
-            self.game.board.itemconfigure(self.bigone, state=tk.HIDDEN)
-        if len(self.availablehints) == 0:
-            self.iserror = False
-
-        for num in numlist:
-            if num in self.availablehints:
-                self.game.board.itemconfigure(self.digitlist[num], state=tk.HIDDEN)
-                self.availablehints.remove(num)
-            elif not (num == 0 and self.ishead):
-                self.game.board.itemconfigure(self.digitlist[num], state=tk.DISABLED)
-                self.availablehints.add(num)
-
-        if len(self.availablehints) == 1:
-            (remaining,) = self.availablehints
-            self.game.board.itemconfigure(self.digitlist[remaining], state=tk.HIDDEN)
-            self.game.board.itemconfigure(self.bigone, text=remaining, state=tk.DISABLED)
-        elif len(self.availablehints) == 0:
-            self.iserror = True
+        self.togglemask(boardstate.mask_of(numlist))
+
+    def togglemask(self, toggle):
+        '''Flips every hint whose bit is set in toggle'''
+        before = self.game.state.mask(self.id)
+        if self.ishead and not before & 1:
+            toggle &= ~1
+        if not toggle:
+            return
+        if stats.enabled:
+            stats.count('togglehint')
+        after = before ^ toggle
+
+        self.game.state.toggle(self.id, toggle)
+        if (before == 0) != (after == 0):
+            self.iserror = after == 0
+        self.game.scheduler.mark(self)
+        self.game.hintschanged(self, toggle)
 
     def on_click(self, event=None):
         self.game.select(self)
@@ -186,36 +198,45 @@ class Clue:
     def __init__(self, game, cluetext, length, cell_list, clueref):
         self.game = game
 
+        self._iserror = False
         self._isselected = False
         self._ispassiveselected = False
         self._mouseover = False
 
-        self.cluetext = self.__clean(cluetext)
+        self.cluetext = self.game.cleaner(cluetext)
         self.length = length
         self.cells = cell_list
         for cell in self.cells:
             cell.clues.append(self)
         self.clueref = clueref
+        self.game.state.add_clue(clueref, [cell.id for cell in self.cells])
 
-        matchtext = '[0-9]+[AD]|[0-9,]+'
-        self.cluestyle = tuple(re.split(matchtext, cluetext))
-        self.refrences = tuple(re.findall(matchtext, cluetext))
+        self.cluestyle, self.refrences = cluecompiler.split_clue(cluetext)
         self.refrenceclues = tuple(ref for ref in self.refrences if ref[-1] in 'AD')
         self.game.cluetypes[self.cluestyle].append(cluetext)
 
         if self.clueref[1] == 'A':
-            frame = self.game.across
+            self.frame = self.game.across
         else:
-            frame = self.game.down
-        self.rowframes = frame.addclue(self.clueref[0], self.cluetext, self.length)
+            self.frame = self.game.down
+        self.row = None
+        if self.frame is not None:
+            self.row = self.frame.addclue(self.clueref[0], self.cluetext,
+                    self.length, self.on_click)
         self.updatecolor()
 
-        for item in self.rowframes:
-            item.bind('<Button-1>', self.on_click)
-
     def __str__(self):
         return f'{self.getname(self.clueref)}: {self.cluetext}'
 
+    @property
+    def iserror(self):
+        return self._iserror
+
+    @iserror.setter
+    def iserror(self, value):
+        self._iserror = value
+        self.updatecolor()
+
     @property
     def isselected(self):
         return self._isselected
@@ -243,42 +264,50 @@ class Clue:
         self._mouseover = value
         self.updatecolor()
 
+    @property
+    def color(self):
+        if self.iserror:
+            return Colors.error
+        elif self.isselected:
+            return Colors.selected
+        elif self.ispassiveselected or self.mouseover:
+            return Colors.mouseover
+        else:
+            return Colors.foreground
+
+    def highlight(self, isselected, ispassiveselected):
+        self._isselected = isselected
+        self._ispassiveselected = ispassiveselected
+        self.updatecolor()
+
     def updatecolor(self):
+        self.game.scheduler.mark(self)
+
+    def render(self, scheduler):
+        self.frame.setcolor(self.row, self.color)
         if self.isselected:
-            color = Colors.selected
-            self.game.selectionColoredClues.append(self)
-        elif self.ispassiveselected:
-            color = Colors.mouseover
-            self.game.selectionColoredClues.append(self)
-        elif self.mouseover:
-            color = Colors.mouseover
-        else:
-            color = Colors.foreground
-        for item in self.rowframes:
-            item.configure(bg=color)
-
-    def __clean(self, cluetext):
-        output = ''
-        for char in cluetext:
-            if ord(char) < 65536:
-                output += char
-            else:
-                if char not in self.game.charmapping:
-                    self.game.charmapping[char] = f'[{len(self.game.charmapping) + 1}]'
-                output += self.game.charmapping[char]
-        return output
+            self.frame.scroll_to(self.row)
+
+    def digitsets(self):
+        return [boardstate.DIGITSETS[mask]
+                for mask in self.game.state.clue_masks(self.clueref)]
 
     def possibility_count_raw(self):
-        prod = 1
-        for cell in self.cells:
-            prod *= len(cell.values)
-        return prod
+        return math.prod(boardstate.POPCOUNT[
+                self.game.state.clue_masks(self.clueref)].tolist())
 
     def max(self):
-        return int(''.join(str(max(cell.values)) for cell in self.cells))
+        return candidates.maximum(self.digitsets())
 
     def min(self):
-        return int(''.join(str(min(cell.values)) for cell in self.cells))
+        return candidates.minimum(self.digitsets())
+
+    def candidates(self, low=None, high=None):
+        '''Streams the numbers the cells allow, in order, within low..high'''
+        return candidates.iterate(self.digitsets(), low, high)
+
+    def sample(self, k=1, rng=random):
+        return candidates.sample(self.digitsets(), k, rng)
 
     def on_click(self, event=None):
         self.game.selectclue(self)
@@ -300,34 +329,88 @@ class Clue:
         else:
             print('Error: Direction not found')
 
+class Highlighter:
+    '''Remembers which cells and clues the selection colors, and on each new
+    selection only touches the ones whose highlight actually changes'''
+    off = (False, False)
+
+    def __init__(self):
+        self.current = {}
+
+    def apply(self, highlights):
+        '''highlights maps each cell or clue to the flags for its highlight()'''
+        changed = list(self.current.keys() - highlights.keys())
+        for item in changed:
+            item.highlight(*self.off)
+        for item, flags in highlights.items():
+            if self.current.get(item, self.off) != flags:
+                item.highlight(*flags)
+                changed.append(item)
+        if stats.enabled:
+            stats.count('highlight', len(changed))
+        self.current = {item: flags for item, flags in highlights.items()
+                if flags != self.off}
+
+    def clear(self):
+        self.apply({})
+
 class Game:
     def __init__(self, root, number=None):
         self.root = root
 
         self.cell_by_xy = {}
+        self.cell_by_id = []
         self.xy_by_cluenum = {}
         self.cluenum_by_xy = {}
         self.maxx = 0
         self.maxy = 0
 
-        myappid = u'crossnumber'
-        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
-
         self.cellsize = 35
         self.xoff = 5
         self.yoff = 5
-        self.selectionColoredCells = []
-        self.selectionColoredClues = []
+        self.highlighter = Highlighter()
         self.charmapping = {'𝑥': 'x', '𝟤': '^2', '𝟢': '0'}
+        self.cleaner = cluetokenizer.Cleaner(self.charmapping)
         self.selectedCell = None
+        self.selectedClue = None
         self.directionbias = 'A'
 
+        # Created by buildsteps once the numpy modules are loaded
+        self.state = None
         self.clues_by_clueref = {}
         self.cluetypes = collections.defaultdict(list)
+        self.depgraph = None
+        self.checker = None
+        self.navigation = None
+        self.evalcache = evalcache.EvalCache()
+        self.movequeue = movequeue.MoveQueue()
+        self.journal = None
+        self.recording = False
+        self.solversearch = None
+        self.solvercache = evalcache.EvalCache()
+        self.hintsearch = None
+        self.hintcache = evalcache.EvalCache()
 
         self.number = number
+        if root is None:
+            # Model only, for solving without a display
+            self.scheduler = boardrender.NullScheduler()
+            self.renderer = None
+            self.across = self.down = self.status = None
+        else:
+            self.createwindow()
+
+        if number:
+            self.open(number)
+        self.recording = True
+
+    def createwindow(self):
         self.root.title('Crossnumber')
-        self.root.iconbitmap('noun_crossword puzzle_2699735.ico')
+        if sys.platform == 'win32':
+            import ctypes
+            myappid = u'crossnumber'
+            ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
+            self.root.iconbitmap('noun_crossword puzzle_2699735.ico')
 
         def dummy():
             pass
@@ -344,26 +427,47 @@ class Game:
         menubar.add_cascade(label='File', menu=filemenu)
 
         editmenu = tk.Menu(menubar, tearoff=0)
-        editmenu.add_command(label='Undo', command=dummy)
-        editmenu.add_command(label='Redo', command=dummy)
+        editmenu.add_command(label='Undo', command=self.undo)
+        editmenu.add_command(label='Redo', command=self.redo)
+        editmenu.add_separator()
+        editmenu.add_command(label='Start Fork', command=self.startfork)
+        editmenu.add_command(label='Fail Fork', command=self.failfork)
+        editmenu.add_command(label='Switch Fork', command=self.switchfork)
         editmenu.add_separator()
-        editmenu.add_command(label='Start Fork', command=dummy)
-        editmenu.add_command(label='Fail Fork', command=dummy)
-        editmenu.add_command(label='Switch Fork', command=dummy)
+        editmenu.add_command(label='Propagate', command=self.propagate)
         menubar.add_cascade(label='Edit', menu=editmenu)
 
+        gomenu = tk.Menu(menubar, tearoff=0)
+        gomenu.add_command(label='Next Clue', accelerator='Tab',
+                command=lambda: self.jumpclue(1))
+        gomenu.add_command(label='Previous Clue', accelerator='Shift+Tab',
+                command=lambda: self.jumpclue(-1))
+        gomenu.add_command(label='Next Unsolved', accelerator='Enter',
+                command=lambda: self.jumpunsolved(1))
+        gomenu.add_command(label='Previous Unsolved', accelerator='Shift+Enter',
+                command=lambda: self.jumpunsolved(-1))
+        menubar.add_cascade(label='Go', menu=gomenu)
+
         helpmenu = tk.Menu(menubar, tearoff=0)
+        helpmenu.add_command(label='Hint', command=self.hint)
         helpmenu.add_command(label='About', command=dummy)
-        menubar.add_cascade(label='Help', menu=dummy)
+        helpmenu.add_command(label='Stats', command=self.showstats)
+        menubar.add_cascade(label='Help', menu=helpmenu)
 
         self.root.config(menu=menubar)
 
         self.board = tk.Canvas(self.root, width=600, height=600)
         self.board.grid(row=0, column=0, sticky=tk.NSEW)
+        self.scheduler = boardrender.RenderScheduler(self.root)
+        self.renderer = boardrender.BoardRenderer(self.board, self.cellsize,
+                self.xoff, self.yoff, Colors.foreground, Colors.hints,
+                self.scheduler)
         self.across = clueframe.ClueFrame(self.root, 'Across', width=300)
         self.across.grid(row=0, column=1, sticky=tk.NSEW)
         self.down = clueframe.ClueFrame(self.root, 'Down', width=300)
         self.down.grid(row=0, column=2, sticky=tk.NSEW)
+        self.status = tk.Label(self.root, anchor=tk.W)
+        self.status.grid(row=1, column=0, columnspan=3, sticky=tk.EW)
 
         self.root.grid_columnconfigure(0, weight=1)
         #self.root.grid_columnconfigure(1, weight=1)
@@ -372,9 +476,113 @@ class Game:
 
         self.root.bind('<KeyPress>', self.on_keydown)
 
-        if number:
-            self.open(number)
-
+    def open(self, number):
+        with stats.phase('open'):
+            data = self.loadpuzzle(number)
+            self.build(data)
+        self.recoverautosave(number)
+        self.journal = journal.Journal(f'cross{number}', self.state)
+
+    def loadpuzzle(self, number):
+        with stats.phase('load'):
+            return puzzlecache.load(f'crossnumber{number}.pdf')
+
+    def openlater(self, number, chunk=50):
+        '''Opens a puzzle without holding up the window. Loading starts
+        once the empty board has painted, and the board and clue lists are
+        then built a chunk per idle callback behind a progress message'''
+        self.number = number
+        self.progress = self.board.create_text(300, 300, text='Loading puzzle...',
+                font=('Helvetica', 14))
+        self.board.bind('<Expose>', lambda event: self.firstpaint(number, chunk))
+
+    def firstpaint(self, number, chunk):
+        self.board.unbind('<Expose>')
+        painted = time.perf_counter() - STARTED
+        stats.record('first paint', painted)
+        if stats.enabled:
+            print(f'First paint {painted*1000:.0f} ms after start')
+        self.root.after_idle(self.startbuild, number, chunk)
+
+    def startbuild(self, number, chunk):
+        with stats.phase('open'):
+            data = self.loadpuzzle(number)
+        self.buildchunk(self.buildsteps(data, chunk), number)
+
+    def buildchunk(self, steps, number):
+        with stats.phase('open'), stats.phase('build'):
+            fraction = next(steps, None)
+        if fraction is not None:
+            self.board.itemconfigure(self.progress,
+                    text=f'Loading puzzle... {fraction:.0%}')
+            self.root.after_idle(self.buildchunk, steps, number)
+            return
+        self.board.delete(self.progress)
+        self.recoverautosave(number)
+        self.journal = journal.Journal(f'cross{number}', self.state)
+        ready = time.perf_counter() - STARTED
+        stats.record('puzzle ready', ready)
+        if stats.enabled:
+            print(f'Puzzle ready {ready*1000:.0f} ms after start')
+
+    def recoverautosave(self, number):
+        '''Offers to bring back the board a session left in its autosave
+        without saving it. Runs before the journal starts, since the
+        journal's first write replaces the autosave. Without a window the
+        board is recovered without asking'''
+        autosave = journal.recover(f'cross{number}', self.state.size)
+        if autosave is None or autosave[0] == self.state.snapshot():
+            return
+        try:
+            if os.path.getmtime(f'cross{number}.sav') >= autosave[1]:
+                return
+        except OSError:
+            pass
+        if self.root is not None and not messagebox.askyesno('Crossnumber',
+                'Recover the changes from the last session that were not saved?'):
+            return
+        self.restore(autosave[0])
+
+    def build(self, data):
+        '''Creates the cells and clues from parsed puzzle data'''
+        with stats.phase('build'):
+            for _ in self.buildsteps(data):
+                pass
+
+    def buildsteps(self, data, chunk=None):
+        '''Creates the cells and clues chunk clues or cells at a time,
+        yielding the fraction done after each chunk. Everything at once
+        when chunk is None'''
+        loadmodel()
+        self.state = boardstate.BoardState()
+        clues = data['clues']
+        with stats.phase('anchors'):
+            for cluenum, x, y in data['anchors']:
+                self.start_clue_anchor(cluenum, x, y)
+        step = chunk or max(len(clues), 1)
+        for start in range(0, len(clues), step):
+            with stats.phase('clues'):
+                for cluenum, direction, cluetext, length in clues[start:start + step]:
+                    self.create_clue(cluenum, direction, cluetext, length)
+            yield min(start + step, len(clues)) / len(clues) / 2
+
+        if self.renderer is not None:
+            cells = list(self.cell_by_xy.values())
+            step = chunk or max(len(cells), 1)
+            for start in range(0, len(cells), step):
+                with stats.phase('cell widgets'):
+                    self.renderer.create_cells(cells[start:start + step])
+                yield 0.5 + min(start + step, len(cells)) / len(cells) / 2
+            self.drawbackground()
+
+        with stats.phase('depgraph'):
+            self.depgraph = depgraph.DependencyGraph.from_game(self)
+        self.checker = consistency.ConsistencyChecker(self)
+        self.navigation = navigation.NavigationIndex(self.cell_by_xy.values(),
+                self.clues_by_clueref.values())
+        self.scheduler.mark(self.checker)
+
+    def drawbackground(self):
         rect = self.board.create_rectangle(
             self.xoff - 1,
             self.yoff - 1,
@@ -383,74 +591,7 @@ class Game:
             fill=Colors.blanks)
         self.board.tag_lower(rect)
 
-    def open(self, number):
-        filename = f'crossnumber{number}.pdf'
-        doc = fitz.open(filename)
-        self.raw_clue_locations = self.__get_raw_clue_locations(doc)
-        self.raw_clue_text = doc.getPageText(1)
-        doc.close()
-
-        self.__process_clue_locations()
-        self.__process_clue_text()
-
-    def __get_raw_clue_locations(self, doc):
-        raw_clue_locations = []
-        clue_check = 0
-        for block in doc[0].getText('dict')['blocks']:
-            if 'lines' not in block:
-                continue
-            for line in block['lines']:
-                for span in line['spans']:
-                    if span['flags'] == 4  and span['text'].isnumeric():
-                        clue_check += 1
-                        if str(clue_check) != span['text']:
-                            print(f'Clue mismatch {span["text"]}.  Expecting {clue_check}.')
-                            raise SyntaxError
-                        raw_clue_locations.append((int(span['text']), span['bbox'][0], span['bbox'][1]))
-        return raw_clue_locations
-
-    def __get_increment_factor(self, distances, label):
-        for increment in range(1, 50):
-            total_offset = 0
-            for x in distances:
-                val = increment * (x - distances[0]) / (distances[-1] - distances[0])
-                offset = abs(val - round(val))
-                total_offset += offset
-            if total_offset <= 1:
-                return increment
-        print('No {label} offset found')
-        raise SyntaxError
-
-    def __process_clue_locations(self):
-        width = sorted(x[1] for x in self.raw_clue_locations)
-        width_increment = self.__get_increment_factor(width, 'width')
-        height = sorted(x[2] for x in self.raw_clue_locations)
-        height_increment = self.__get_increment_factor(height, 'height')
-
-        clue_locations = []
-        for clue, w, h in self.raw_clue_locations:
-            new_width = round(width_increment * (w - width[0]) / (width[-1] - width[0]))
-            new_height = round(height_increment * (h - height[0]) / (height[-1] - height[0]))
-            clue_locations.append((clue, new_width, new_height))
-            self.start_clue_anchor(clue, new_width, new_height)
-        return clue_locations
-
-    def __process_clue_text(self):
-        across_start = self.raw_clue_text.find('\nAcross\n')+1
-        down_start = self.raw_clue_text.find('\nDown\n')+1
-
-        across_clues = self.raw_clue_text[across_start:down_start]
-        for x in re.findall('([0-9]+) (.*?)\(([0-9]+)\)', across_clues, re.DOTALL):
-            self.create_clue(int(x[0]), 'A', x[1], int(x[2]))
-
-        down_clues = self.raw_clue_text[down_start:]
-        for x in re.findall('([0-9]+) (.*?)\(([0-9]+)\)', down_clues, re.DOTALL):
-            self.create_clue(int(x[0]), 'D', x[1], int(x[2]))
-
     def create_clue(self, cluenum, direction, cluetext, length):
-        cluetext = cluetext.replace('\n', ' ')
-        while cluetext[-1] == ' ':
-            cluetext = cluetext[:-1]
         if cluetext[-1] != '.':
             print('No period ending', cluetext)
         cell_list = self.create_clue_cells(cluenum, direction, int(length))
@@ -478,50 +619,269 @@ class Game:
             savelist.append((cell.x, cell.y, tuple(cell.availablehints)))
         with open(f'cross{self.number}.sav', 'w') as f:
             json.dump(savelist, f)
+        with open(f'cross{self.number}.moves', 'wb') as f:
+            f.write(self.movequeue.save())
 
     def load(self):
+        '''Loads the manual save. The autosave is only for recovering after
+        a crash, which opening the puzzle offers'''
         with open(f'cross{self.number}.sav') as f:
             jsondata = json.load(f)
+        self.recording = False
         for x, y, availablehints in jsondata:
             cell = self.cell_by_xy[(x,y)]
             toggle = cell.availablehints ^ set(availablehints)
             cell.togglehint(toggle)
+        self.recording = True
+        try:
+            with open(f'cross{self.number}.moves', 'rb') as f:
+                self.movequeue = movequeue.MoveQueue().load(f.read())
+        except FileNotFoundError:
+            self.movequeue = movequeue.MoveQueue()
 
     def restart(self):
         for cell in self.cell_by_xy.values():
             toggle = cell.availablehints ^ set(range(10))
             cell.togglehint(toggle)
 
+    def propagate(self, checks=None):
+        '''Settles every deduction the clue checks allow, then repaints once'''
+        if self.depgraph is None:
+            return None
+        if checks is None:
+            checks, unknown = cluecompiler.compile_game(self)
+            cluecompiler.report(unknown)
+        propagator = propagate.Propagator.from_game(self, checks,
+                cache=self.evalcache)
+        dirty = self.depgraph.pop_dirty()
+        with stats.phase('propagate'):
+            settled = propagator.run(dirty)
+            propagator.apply(self)
+        if settled:
+            self.depgraph.dirty.clear()
+        else:
+            print(f'Contradiction at {self.cell_by_xy[propagator.failed]}')
+            self.depgraph.dirty.update(dirty)
+        return propagator
+
+    def hintschanged(self, cell, toggle):
+        '''Called whenever a cell's available hints change, with the mask
+        of the hints that flipped'''
+        if self.depgraph is not None:
+            self.depgraph.mark_cell((cell.x, cell.y))
+        if self.checker is not None:
+            self.checker.cellchanged((cell.x, cell.y))
+        if self.navigation is not None:
+            self.navigation.cellchanged(cell)
+        if self.recording:
+            self.movequeue.add(cell.id, toggle)
+        if self.journal is not None:
+            self.journal.record(cell.id, toggle)
+        if self.hintsearch is not None:
+            self.cancelhint()
+        if self.solversearch is not None:
+            self.cancelsolve()
+            self.showstatus('Search stopped because the board changed')
+
+    def sethints(self, hints):
+        for xy, digits in hints.items():
+            cell = self.cell_by_xy[xy]
+            toggle = cell.availablehints ^ set(digits)
+            if toggle:
+                cell.togglehint(toggle)
+
+    def startfork(self):
+        '''Searches for a solution in the background and shows the branch
+        that survives as a new fork. Any hint change before it arrives
+        cancels it, since the result would overwrite the change'''
+        if self.solversearch is not None or self.depgraph is None:
+            return
+        import solver
+        checks, unknown = cluecompiler.compile_game(self)
+        search = solver.BackgroundSolve(
+                propagate.Propagator.from_game(self, checks, cache=self.solvercache),
+                budget=solver.Budget(seconds=SOLVE_SECONDS))
+        self.solversearch = search
+        self.showstatus('Searching for a solution...')
+        self.root.after(100, self.pollsolver, search)
+
+    def cancelsolve(self):
+        if self.solversearch is not None:
+            self.solversearch.stop()
+            self.solversearch = None
+
+    def pollsolver(self, search):
+        import solver
+        if search is not self.solversearch:
+            return
+        if not search.done():
+            self.root.after(100, self.pollsolver, search)
+            return
+        self.solversearch = None
+        try:
+            result = search.result()
+        except solver.OutOfBudget as e:
+            self.showstatus(f'No solution found in {SOLVE_SECONDS} s '
+                    f'({e.args[0]} branches)')
+            return
+        if result is None:
+            self.showstatus('No solution found')
+            return
+        xy, digit, hints = result
+        if xy is not None:
+            self.movequeue.fork(self.cell_by_xy[xy].id, digit, self.state.snapshot())
+        self.sethints(hints)
+        self.showstatus('Solution found')
+
+    def close(self):
+        '''Stops any background search and flushes the journal before exit'''
+        self.cancelsolve()
+        self.cancelhint()
+        if self.journal is not None:
+            self.journal.close()
+
+    def hint(self):
+        '''Looks for the next deduction in the background. Any key press or
+        hint change before it arrives cancels it'''
+        if self.depgraph is None:
+            return
+        import hintengine
+        self.cancelhint()
+        checks, unknown = cluecompiler.compile_game(self)
+        search = hintengine.HintSearch(
+                propagate.Propagator.from_game(self, checks, cache=self.hintcache))
+        self.hintsearch = search
+        self.root.after(50, self.pollhint, search)
+
+    def cancelhint(self):
+        if self.hintsearch is not None:
+            self.hintsearch.stop()
+            self.hintsearch = None
+
+    def pollhint(self, search):
+        if search is not self.hintsearch:
+            return
+        if not search.done():
+            self.root.after(50, self.pollhint, search)
+            return
+        self.hintsearch = None
+        result = search.result()
+        if result is None:
+            self.showstatus('No deduction found')
+            return
+        clueref, xy, digits = result
+        clue = self.clues_by_clueref[clueref]
+        cell = self.cell_by_xy[xy]
+        self.showstatus(f'{clue.getname(clueref)} rules out '
+                f'{", ".join(map(str, sorted(digits)))} in the selected cell: '
+                f'{clue.cluetext}')
+        self.directionbias = clueref[1]
+        self.select(cell, toggle=False)
+
+    def showstatus(self, text):
+        '''Shows a message on the status line under the board'''
+        if self.status is None:
+            print(text)
+        else:
+            self.status.config(text=text)
+
+    def applymove(self, move):
+        if move is not None:
+            cellid, mask = move
+            self.recording = False
+            self.cell_by_id[cellid].togglemask(mask)
+            self.recording = True
+
+    def undo(self):
+        self.applymove(self.movequeue.undo())
+
+    def redo(self):
+        self.applymove(self.movequeue.next())
+
+    def restore(self, snapshot):
+        '''Puts the board back to a BoardState snapshot without logging moves'''
+        target = self.state.copy()
+        target.restore(snapshot)
+        cellids, masks = self.state.diff(target)
+        self.recording = False
+        for cellid, mask in zip(cellids.tolist(), masks.tolist()):
+            self.cell_by_id[cellid].togglemask(mask)
+        self.recording = True
+
+    def revertfork(self):
+        '''Returns the board to how it was before the last fork'''
+        fork = self.movequeue.revert()
+        if fork is not None:
+            self.restore(fork.snapshot)
+        return fork
+
+    def failfork(self):
+        '''Abandons the current fork and rules out the digit it guessed'''
+        fork = self.movequeue.fail()
+        if fork is not None:
+            self.restore(fork.snapshot)
+            cell = self.cell_by_id[fork.cellid]
+            if fork.digit in cell.availablehints:
+                cell.togglehint((fork.digit,))
+
+    def switchfork(self):
+        '''Abandons the current fork and guesses the cell's next digit instead'''
+        fork = self.revertfork()
+        if fork is None:
+            return
+        cell = self.cell_by_id[fork.cellid]
+        digits = sorted(cell.availablehints)
+        later = ([d for d in digits if d > fork.digit]
+                + [d for d in digits if d < fork.digit])
+        if later:
+            self.movequeue.fork(cell.id, later[0], self.state.snapshot())
+            cell.togglehint(cell.availablehints ^ {later[0]})
+
     def on_keydown(self, event):
+        self.cancelhint()
+        if self.navigation is None:
+            # Still building, the cells have no canvas items yet
+            return
         if 48 <= event.keycode <= 57:
             if self.selectedCell is not None:
                 self.selectedCell.on_arrowkey(event.keycode-48, event.state)
         if event.keysym in ('Up', 'Down', 'Left', 'Right'):
             self.moveselected(event.keysym, event.state)
+        elif event.keysym in ('Tab', 'ISO_Left_Tab'):
+            self.jumpclue(-1 if event.state & 1 or event.keysym == 'ISO_Left_Tab' else 1)
+            return 'break'
+        elif event.keysym == 'Return':
+            self.jumpunsolved(-1 if event.state & 1 else 1)
 
     def select(self, cellselection, toggle=True):
         '''Select cell for current input.
-        Color selected and related cells'''
-        self.clearselections()
+        Color selected and related cells. Ignored until the board is built'''
+        if self.navigation is None:
+            return
+        highlights = {}
         clues = cellselection.clues
         if len(clues) == 2:
             if toggle and cellselection is self.selectedCell:
                 self.directionbias = Clue.dirswitch(self.directionbias)
             if self.directionbias == 'A':
                 clueselection = clues[0]
-                clues[1].ispassiveselected = True
+                highlights[clues[1]] = (False, True)
             else:
                 clueselection = clues[1]
-                clues[0].ispassiveselected = True
+                highlights[clues[0]] = (False, True)
         else:
             clueselection = clues[0]
             self.directionbias = clueselection.clueref[1]
-        clueselection.isselected = True
+        highlights[clueselection] = (True, False)
         for cell in clueselection.cells:
             if cell is not cellselection:
-                cell.isrowselected = True
-        cellselection.isselected = True
+                highlights[cell] = (False, True)
+        highlights[cellselection] = (True, False)
+        if stats.enabled:
+            stats.count('select')
+        self.highlighter.apply(highlights)
         self.selectedCell = cellselection
+        self.selectedClue = clueselection
 
     def selectclue(self, clue):
         '''Select cell based on clue click'''
@@ -533,17 +893,35 @@ class Game:
 
     def clearselections(self):
         '''Clears cell/clue colors caused bycurrent selections'''
-        while self.selectionColoredCells:
-            cell = self.selectionColoredCells.pop()
-            cell.isselected = False
-            cell.isrowselected = False
-        while self.selectionColoredClues:
-            clue = self.selectionColoredClues.pop()
-            clue.isselected = False
-            clue.ispassiveselected = False
+        self.highlighter.clear()
+
+    def showstats(self):
+        '''Opens a window with the current timings and counters'''
+        window = tk.Toplevel(self.root)
+        window.title('Stats')
+        text = tk.Text(window, width=70, height=30, font='TkFixedFont')
+        text.grid(row=0, column=0, columnspan=3, sticky=tk.NSEW)
+
+        def refresh():
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, stats.report())
+        def collect():
+            stats.enable()
+            refresh()
+        def clear():
+            stats.reset()
+            refresh()
+
+        tk.Button(window, text='Refresh', command=refresh).grid(row=1, column=0)
+        tk.Button(window, text='Collect', command=collect).grid(row=1, column=1)
+        tk.Button(window, text='Reset', command=clear).grid(row=1, column=2)
+        window.grid_columnconfigure(0, weight=1)
+        window.grid_rowconfigure(0, weight=1)
+        refresh()
 
     def start_clue_anchor(self, cluenum, x, y):
         self.cell_by_xy[(x, y)] = Cell(self, True, x, y, text=cluenum)
+        self.cell_by_id.append(self.cell_by_xy[(x, y)])
         self.xy_by_cluenum[cluenum] = (x, y)
         self.cluenum_by_xy[(x, y)] = cluenum
         self.maxx = max(x, self.maxx)
@@ -559,31 +937,47 @@ class Game:
                 ref = (x, y+i)
             if ref not in self.cell_by_xy:
                 self.cell_by_xy[ref] = Cell(self, False, ref[0], ref[1])
+                self.cell_by_id.append(self.cell_by_xy[ref])
             cell_list.append(self.cell_by_xy[ref])
         return cell_list
 
     def moveselected(self, direction, state):
-        if self.selectedCell is None:
+        '''Steps to the neighbouring cell, or with Shift to the end of the run'''
+        if self.selectedCell is None or self.navigation is None:
             return
-        x = self.selectedCell.x
-        y = self.selectedCell.y
-        xshift, yshift = {'Up': (0, -1), 'Down': (0, 1), 'Left': (-1, 0), 'Right': (1, 0)}[direction]
-        if state & 1:
-            count = 1
-            while (x + xshift*count,y + yshift*count) in self.cell_by_xy:
-                count += 1
-            if count >= 2:
-                self.cell_by_xy[(
-                    x + xshift*(count-1),
-                    y + yshift*(count-1))].on_click()
-        else:
-            if (x + xshift, y + yshift) in self.cell_by_xy:
-                self.cell_by_xy[(x + xshift, y + yshift)].on_click()
+        table = self.navigation.end if state & 1 else self.navigation.step
+        target = table[direction][self.selectedCell]
+        if target is not None:
+            target.on_click()
+
+    def jumpclue(self, step):
+        '''Selects the next clue in the lists, or the previous for step -1'''
+        if self.navigation is not None and self.navigation.clues:
+            self.selectclue(self.navigation.nextclue(self.selectedClue, step))
+
+    def jumpunsolved(self, step):
+        '''Selects the next cell in reading order with more than one hint'''
+        if self.navigation is None:
+            return
+        target = self.navigation.nextunsolved(self.selectedCell, step)
+        if target is not None:
+            self.select(target, toggle=False)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crossnumber solving aid')
+    parser.add_argument('number', type=int, nargs='?', default=10)
+    parser.add_argument('--stats', metavar='FILE',
+            help='collect timings and counters and dump them here as JSON on exit')
+    args = parser.parse_args()
+    stats.enable(args.stats is not None)
+
     root = tk.Tk()
-    cross = Game(root, 10)
+    cross = Game(root)
+    cross.openlater(args.number)
     root.mainloop()
+    cross.close()
+    if args.stats:
+        stats.dump(args.stats)
 
 
 # print(cross.display_basic())
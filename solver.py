@@ -0,0 +1,156 @@
+import concurrent.futures
+import multiprocessing
+import time
+
+import numpy as np
+
+import propagate
+
+_cancel = None
+
+def _init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+class OutOfBudget(Exception):
+    '''The search used up its branches or time before finding anything.
+    args[0] is the number of branches it tried'''
+
+class Budget:
+    '''Caps a search at so many branches or seconds, None for no cap.
+    Worker processes each get their own copy of the branch count'''
+    def __init__(self, nodes=None, seconds=None):
+        self.nodes = nodes
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.used = 0
+
+    def spend(self):
+        self.used += 1
+        if (self.nodes is not None and self.used > self.nodes
+                or self.deadline is not None and time.monotonic() > self.deadline):
+            raise OutOfBudget(self.used)
+
+def pick_cell(propagator):
+    '''Cell to branch on, or None if every cell is solved.
+
+    Clues with more candidates than the propagator's limit are never
+    revised, so while there are any this is the most constrained unsolved
+    cell of the one closest to the limit. Otherwise the most constrained
+    unsolved cell on the board'''
+    counts = propagator.state.counts()
+    over = []
+    for clueref in propagator.checks:
+        count = propagator.count(clueref)
+        if count > propagator.limit:
+            over.append((count, clueref))
+    if over:
+        cellids = propagator.clue_ids[min(over)[1]]
+        unsolved = cellids[counts[cellids] > 1]
+    else:
+        unsolved = np.flatnonzero(counts > 1)
+    if not len(unsolved):
+        return None
+    cellid = unsolved[np.argmin(counts[unsolved])]
+    return propagator.state.xy_by_id[cellid]
+
+def branch(propagator, xy, digit):
+    '''Copy of the propagator with xy fixed to digit and settled again,
+    or None if that leads to a contradiction'''
+    output = propagate.Propagator(propagator.state, propagator.graph,
+            propagator.checks, propagator.limit, propagator.cache)
+    output.fix(xy, digit)
+    if output.run(output.graph.affected(xy)):
+        return output
+    return None
+
+def search(propagator, budget=None, cancel=None):
+    '''Depth first search from a settled propagator. Returns the solved hints,
+    or None if there are none or cancel was set.
+
+    Keeps its own stack of untried branches, so deep boards do not hit the
+    recursion limit. Raises OutOfBudget if budget runs out first'''
+    xy = pick_cell(propagator)
+    if xy is None:
+        return propagator.hints
+    stack = [(propagator, xy, digit) for digit in sorted(propagator.cellhints(xy),
+            reverse=True)]
+    while stack:
+        if cancel is not None and cancel.is_set():
+            return None
+        if budget is not None:
+            budget.spend()
+        child = branch(*stack.pop())
+        if child is None:
+            continue
+        xy = pick_cell(child)
+        if xy is None:
+            return child.hints
+        stack.extend((child, xy, digit) for digit in sorted(child.cellhints(xy),
+                reverse=True))
+    return None
+
+def explore(propagator, xy, digit, budget=None):
+    child = branch(propagator, xy, digit)
+    if child is None:
+        return None
+    result = search(child, budget, _cancel)
+    if result is not None:
+        _cancel.set()
+    return result
+
+def solve(propagator, workers=None, budget=None, cancel=None):
+    '''Forks on the cell pick_cell chooses and searches every branch in its
+    own process. The first branch to solve, or setting cancel, stops the rest.
+
+    Returns (xy, digit, hints) for the surviving branch, with xy and digit
+    None if propagation alone solved it, or None if nothing survives or the
+    search was cancelled. Raises OutOfBudget if every branch that did not
+    fail ran out of budget'''
+    if cancel is None:
+        cancel = multiprocessing.Event()
+    propagator = propagate.Propagator(propagator.state, propagator.graph,
+            propagator.checks, propagator.limit, propagator.cache)
+    if not propagator.run():
+        return None
+    xy = pick_cell(propagator)
+    if xy is None:
+        return None, None, propagator.hints
+
+    used = None
+    with concurrent.futures.ProcessPoolExecutor(workers,
+            initializer=_init_worker, initargs=(cancel,)) as pool:
+        futures = {pool.submit(explore, propagator, xy, digit, budget): digit
+                for digit in sorted(propagator.cellhints(xy))}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except OutOfBudget as e:
+                used = (used or 0) + e.args[0]
+                continue
+            if result is not None:
+                cancel.set()
+                pool.shutdown(cancel_futures=True)
+                return xy, futures[future], result
+    if used is not None and not cancel.is_set():
+        raise OutOfBudget(used)
+    return None
+
+class BackgroundSolve:
+    '''solve running on a background thread so the Tk loop keeps going.
+    stop() cancels every worker process, so quitting does not have to wait
+    for the search to finish'''
+    def __init__(self, propagator, workers=None, budget=None):
+        self.cancel = multiprocessing.Event()
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.future = executor.submit(solve, propagator, workers, budget,
+                self.cancel)
+        executor.shutdown(wait=False)
+
+    def stop(self):
+        self.cancel.set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
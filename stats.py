@@ -0,0 +1,85 @@
+'''Phase timings and event counters for finding out where the time goes.
+
+Off by default. Hot paths test stats.enabled before counting, and phase()
+hands back a shared do-nothing context while disabled, so an ordinary run
+pays for one attribute lookup per hook.'''
+import collections
+import contextlib
+import json
+import time
+
+enabled = False
+durations = collections.defaultdict(float)
+calls = collections.Counter()
+counters = collections.Counter()
+
+_stack = []
+_nothing = contextlib.nullcontext()
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+def reset():
+    durations.clear()
+    calls.clear()
+    counters.clear()
+
+def count(name, n=1):
+    counters[name] += n
+
+def record(name, seconds):
+    '''Adds a duration measured some other way than with phase()'''
+    if enabled:
+        durations[name] += seconds
+        calls[name] += 1
+
+@contextlib.contextmanager
+def _timed(name):
+    _stack.append(name)
+    name = '/'.join(_stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations[name] += time.perf_counter() - start
+        calls[name] += 1
+        _stack.pop()
+
+def phase(name):
+    '''Times a with block. Phases nested inside it are named parent/child'''
+    if not enabled:
+        return _nothing
+    return _timed(name)
+
+def ratio(numerator, denominator):
+    return counters[numerator] / counters[denominator] if counters[denominator] else 0
+
+def snapshot():
+    return {
+        'enabled': enabled,
+        'phases': {name: {'ms': durations[name] * 1000, 'calls': calls[name]}
+                for name in durations},
+        'counters': dict(counters),
+        'itemconfigure per togglehint': ratio('itemconfigure', 'togglehint'),
+        'repaints per selection': ratio('highlight', 'select'),
+    }
+
+def report():
+    '''The snapshot as aligned text for the Stats window'''
+    data = snapshot()
+    if not data['enabled'] and not durations and not counters:
+        return 'Stats are off. Start with --stats or press Collect.'
+    lines = ['Phases']
+    for name, phase in sorted(data['phases'].items()):
+        lines.append(f'  {name:40} {phase["ms"]:10.1f} ms  x{phase["calls"]}')
+    lines.append('Counters')
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f'  {name:40} {value:10}')
+    for name in ('itemconfigure per togglehint', 'repaints per selection'):
+        lines.append(f'  {name:40} {data[name]:10.2f}')
+    return '\n'.join(lines)
+
+def dump(filename):
+    with open(filename, 'w') as f:
+        json.dump(snapshot(), f, indent=1)